@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image
+from profiling import PROFILER
+from rawcache import RAW
+
+ART_DIR = Path("item_images")
+
+# Sources at least this many times larger than the target are shrunk with a
+# cheap box reduce (or JPEG draft decoding) before the final resample.
+REDUCING_GAP = 3.0
+
+# ======================
+# Art decoding
+# ======================
+def load_resized(path, size, resample=Image.Resampling.BICUBIC):
+    img = Image.open(path)
+    # Only JPEG supports draft(); it decodes straight at 1/2, 1/4 or 1/8 scale
+    img.draft("RGB", size)
+    return img.convert("RGBA").resize(size, resample, reducing_gap=REDUCING_GAP)
+
+# ======================
+# Art cache
+# ======================
+class ArtCache:
+    """
+    Art resized to a template's art box, cached in memory (LRU) and in the
+    raw image cache keyed by (source content hash, target size, resample
+    filter).
+    """
+
+    def __init__(self, root=ART_DIR, max_images=64):
+        self.root = Path(root)
+        self.max_images = max_images
+        self._images = OrderedDict()
+
+    def get(self, name, size, resample=Image.Resampling.BICUBIC):
+        """Return the art image `name` resized to `size`. Don't draw on it."""
+        path = self.root / name
+        size = tuple(size)
+        key = (RAW.digest(path), size, int(resample))
+
+        img = self._images.get(key)
+        if img is not None:
+            self._images.move_to_end(key)
+            PROFILER.count("art.memory_hit")
+            return img
+
+        with PROFILER.stage("art_cache_read"):
+            img = RAW.load("art", RAW.key(*key))
+        if img is not None:
+            PROFILER.count("art.disk_hit")
+        else:
+            PROFILER.count("art.miss")
+            with PROFILER.stage("art_resize"):
+                img = load_resized(path, size, resample)
+            RAW.store("art", RAW.key(*key), img)
+
+        self._images[key] = img
+        while len(self._images) > self.max_images:
+            self._images.popitem(last=False)
+
+        return img
+
+    def invalidate(self):
+        self._images.clear()
+
+ART = ArtCache()
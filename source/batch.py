@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing import Pool
+from icons import ICONS
+from profiling import PROFILER
+from templates import TEMPLATES
+
+# ======================
+# Worker state
+# ======================
+# Each worker process gets the render function once and keeps its own
+# template/icon/font caches warm for every item it is handed. With profiling
+# on, each result carries the worker's events back to the parent. Workers
+# may be spawned rather than forked, so anything the render needs from the
+# parent is rebuilt by `setup(*setup_args)` before the first item.
+_render = None
+_ship_profile = False
+
+def warm_caches(template_names):
+    for name in template_names:
+        TEMPLATES.load(name)
+    ICONS.preload()
+
+def _init_worker(render, template_names, profile=False, setup=None, setup_args=()):
+    global _render, _ship_profile
+    _render = render
+    _ship_profile = profile
+    if profile:
+        PROFILER.enable()
+    if setup:
+        setup(*setup_args)
+    warm_caches(template_names)
+
+def _render_item(job):
+    index, item = job
+    try:
+        result, error = _render(item), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    return index, result, error, PROFILER.drain() if _ship_profile else None
+
+def _collect(result):
+    index, value, error, profile = result.get()
+    if profile:
+        PROFILER.merge(profile)
+    return index, value, error
+
+# ======================
+# Batch rendering
+# ======================
+def render_deck(items, render, workers=None, max_pending=None, template_names=(), setup=None, setup_args=()):
+    """
+    Render every item with `render(item) -> filename`, yielding
+    (index, item, filename, error) in deck order. A failing item yields its
+    traceback as `error` instead of aborting the run.
+
+    `items` may be any iterable and is consumed lazily: at most
+    `max_pending` items are in flight at once, so memory stays flat however
+    large the deck is.
+
+    `setup(*setup_args)` runs in each worker process before it renders;
+    with workers=1 everything runs in this process, which is already set up.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(render, template_names)
+        for job in enumerate(items):
+            index, filename, error, _ = _render_item(job)
+            yield index, job[1], filename, error
+        return
+
+    max_pending = max_pending or workers * 4
+    pending = deque()
+
+    initargs = (render, template_names, PROFILER.enabled, setup, setup_args)
+    with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for job in enumerate(items):
+            pending.append((job[1], pool.apply_async(_render_item, (job,))))
+            if len(pending) >= max_pending:
+                item, result = pending.popleft()
+                index, filename, error = _collect(result)
+                yield index, item, filename, error
+
+        while pending:
+            item, result = pending.popleft()
+            index, filename, error = _collect(result)
+            yield index, item, filename, error
+
+# ======================
+# Progress
+# ======================
+class Progress:
+    """Prints items/sec to stderr at most every `interval` seconds."""
+
+    def __init__(self, interval=2.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.count = 0
+        self.start = self.last = time.perf_counter()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def tick(self, n=1):
+        self.count += n
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.last = now
+            print(f"{self.count} items, {self.rate():.1f} items/s", file=self.stream)
+
+    def done(self):
+        elapsed = time.perf_counter() - self.start
+        print(f"{self.count} items in {elapsed:.1f}s, {self.rate():.1f} items/s", file=self.stream)
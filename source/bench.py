@@ -0,0 +1,266 @@
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import PIL
+from PIL import ImageDraw
+from synthetic import synthetic_deck, write_deck, COMPLEXITY
+
+RESULTS_VERSION = 1
+
+# ======================
+# Benchmarks
+# ======================
+# Each setup function gets the synthetic items and returns a zero-argument
+# callable that does one unit of work. Caches (fonts, metrics, templates,
+# art, compile_markup) are left warm, as they are in a deck run; each call
+# moves on to the next item so text varies between calls.
+def bench_parse_inline(items):
+    from markup import parse_inline
+    lines = itertools.cycle([
+        line for item in items for line in item["description"].split("\n") if line
+    ])
+    return lambda: parse_inline(next(lines))
+
+def bench_wrap_tokens(items):
+    import cards
+    from markup import compile_markup, wrap_tokens
+    from metrics import METRICS
+
+    fonts = cards.font_family("body")
+    space = METRICS.width(" ", fonts.normal)
+    lines = itertools.cycle([
+        line.tokens
+        for item in items
+        for para in compile_markup(item["description"]).paragraphs
+        for line in para
+    ])
+    return lambda: wrap_tokens(next(lines), fonts, 669, 28, space)
+
+def bench_fit_markup(items):
+    import cards
+    from markup import fit_markup, paint_layout
+    from templates import TEMPLATES
+
+    template_name = items[0]["template"]
+    layout = cards.prepare_template(template_name)
+    box = layout["description"]
+    base = TEMPLATES.card_layer(template_name, "Common")
+    texts = itertools.cycle([item["description"] for item in items])
+
+    def run():
+        card = base.copy()
+        text_layout = fit_markup(
+            next(texts),
+            cards.font_family("body"),
+            box["width"],
+            box["height"],
+            sizes=box.get("font_sizes")
+        )
+        paint_layout(
+            text_layout,
+            card,
+            ImageDraw.Draw(card),
+            box["x"],
+            box["y"],
+            cards.TEXT_COLOR,
+            icon_set=template_name
+        )
+    return run
+
+def bench_recolor_frame_hsv(items):
+    from templates import TEMPLATES, recolor_frame_hsv
+
+    layout, images = TEMPLATES.load(items[0]["template"])
+    specs = itertools.cycle(layout["rarity_hsv"].values())
+
+    def run():
+        spec = next(specs)
+        recolor_frame_hsv(images["frame"], spec["h"], spec["s"])
+    return run
+
+def bench_render_card(items):
+    from cards import render_card
+    queue = itertools.cycle(items)
+    return lambda: render_card(next(queue))
+
+def bench_render_card_preview(items):
+    from cards import render_card
+    queue = itertools.cycle(items)
+    return lambda: render_card(next(queue), 0.25)
+
+def bench_generate_card(items):
+    import main
+    from output import OutputWriter
+
+    # Encode inline into a scratch directory, never the real output/
+    scratch = tempfile.TemporaryDirectory(prefix="bench_")
+    main.WRITER = OutputWriter(scratch.name, dpi=main.cards.DPI)
+    queue = itertools.cycle(items)
+
+    def run():
+        return main.generate_card(next(queue))
+
+    run.cleanup = scratch.cleanup
+    return run
+
+BENCHMARKS = {
+    "parse_inline": bench_parse_inline,
+    "wrap_tokens": bench_wrap_tokens,
+    "fit_markup": bench_fit_markup,
+    "recolor_frame_hsv": bench_recolor_frame_hsv,
+    "render_card": bench_render_card,
+    "render_card_preview": bench_render_card_preview,
+    "generate_card": bench_generate_card
+}
+
+# ======================
+# Runner
+# ======================
+def time_benchmark(fn, repeat=5):
+    """Per-call seconds for `repeat` runs of at least 0.2s each."""
+    fn()  # warm up caches
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = [t / number for t in timer.repeat(repeat, number)]
+
+    return {
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "min": min(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat
+    }
+
+def run_benchmarks(names, items, repeat=5, stream=sys.stderr):
+    results = {}
+    for name in names:
+        fn = BENCHMARKS[name](items)
+        start = time.perf_counter()
+        try:
+            results[name] = stats = time_benchmark(fn, repeat)
+        finally:
+            # Benchmarks that leave files behind say how to remove them
+            getattr(fn, "cleanup", lambda: None)()
+        print(
+            f"{name:<26} {stats['median'] * 1000:>10.3f} ms  "
+            f"(min {stats['min'] * 1000:.3f}, {stats['number']}x{repeat}, "
+            f"{time.perf_counter() - start:.1f}s)",
+            file=stream
+        )
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine()
+    }
+
+# ======================
+# Comparison
+# ======================
+def compare(base, new, threshold=0.10, stream=sys.stdout):
+    """
+    Compare median per-call times of two result files. Returns the names of
+    benchmarks that got slower by more than `threshold` (a fraction).
+    """
+    regressions = []
+    print(f"{'benchmark':<26} {'base ms':>10} {'new ms':>10} {'change':>8}", file=stream)
+
+    for name in sorted(set(base["benchmarks"]) | set(new["benchmarks"])):
+        old = base["benchmarks"].get(name)
+        cur = new["benchmarks"].get(name)
+        if old is None or cur is None:
+            print(f"{name:<26} {'(only in ' + ('new' if old is None else 'base') + ')':>30}", file=stream)
+            continue
+
+        change = cur["median"] / old["median"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<26} {old['median'] * 1000:>10.3f} {cur['median'] * 1000:>10.3f} {change:>+8.1%}{flag}",
+            file=stream
+        )
+
+    if base.get("environment") != new.get("environment"):
+        print("\nNote: results come from different environments", file=stream)
+
+    return regressions
+
+# ======================
+# Run
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Card renderer benchmarks. Run from the repository root.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write a synthetic deck")
+    gen.add_argument("path", help="output deck, .json or .jsonl")
+    gen.add_argument("-n", "--count", type=int, default=100)
+    gen.add_argument("--complexity", choices=COMPLEXITY, default="normal")
+    gen.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="run benchmarks and write JSON results")
+    run.add_argument("-o", "--output", help="results file (default: print to stdout)")
+    run.add_argument("--only", action="append", choices=BENCHMARKS, help="benchmark to run, repeatable")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--cards", type=int, default=24, help="synthetic items cycled through")
+    run.add_argument("--complexity", choices=COMPLEXITY, default="heavy")
+    run.add_argument("--seed", type=int, default=0)
+
+    cmp = commands.add_parser("compare", help="compare two results files")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="fail when a benchmark's median is slower by more than this fraction (default 0.10)"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        write_deck(args.path, synthetic_deck(args.count, args.complexity, args.seed))
+        return 0
+
+    if args.command == "run":
+        items = list(synthetic_deck(args.cards, args.complexity, args.seed))
+        results = {
+            "version": RESULTS_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment(),
+            "deck": {"cards": args.cards, "complexity": args.complexity, "seed": args.seed},
+            "benchmarks": run_benchmarks(args.only or list(BENCHMARKS), items, args.repeat)
+        }
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
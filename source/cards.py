@@ -0,0 +1,414 @@
+import io
+import math
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+from markup import layout_markup, fit_markup, paint_layout, compile_markup, size_grid, COLOR_MAP
+from templates import TEMPLATES, template_files
+from icons import ICONS, ICON_MAP
+from fonts import FONTS
+from metrics import METRICS
+from outlines import OUTLINES
+from art import ART
+from rawcache import RAW
+from output import parse_output, encode_image
+from profiling import PROFILER
+
+# ======================
+# Configuration
+# ======================
+DEBUG_LAYOUT = True
+
+GRID_WIDTH = 50
+GRID_HEIGHT = 50
+GRID_COLOR = (0, 255, 255, 120)
+GRID_THICKNESS = 1
+
+DPI = 300
+
+# Bump whenever a rendering change should invalidate every built card
+RENDERER_VERSION = 1
+TEXT_COLOR = COLOR_MAP["default"]
+
+# Fonts, templates, icons and item art are resolved under this directory.
+# Nothing is read until the first card needs it.
+ASSET_ROOT = Path(__file__).resolve().parent.parent
+
+def configure(asset_root=None, debug_layout=None, dpi=None):
+    """
+    Point every resource registry at `asset_root` (which holds fonts/,
+    templates/, icons/ and item_images/) and drop anything already loaded.
+    """
+    global ASSET_ROOT, DEBUG_LAYOUT, DPI
+
+    if asset_root is not None:
+        ASSET_ROOT = Path(asset_root).resolve()
+    if debug_layout is not None:
+        DEBUG_LAYOUT = debug_layout
+    if dpi is not None:
+        DPI = dpi
+
+    TEMPLATES.root = ASSET_ROOT / "templates"
+    TEMPLATES.invalidate()
+    ART.root = ASSET_ROOT / "item_images"
+    ART.invalidate()
+    RAW.cache_dir = ASSET_ROOT / ".cache" / "raw"
+    RAW.invalidate()
+    ICONS.reset({name: ASSET_ROOT / path for name, path in ICON_MAP.items()})
+    _families.clear()
+    _static_layers.clear()
+
+def invalidate(paths):
+    """
+    Forget anything loaded from `paths` after they changed on disk. Templates
+    and art notice changes by themselves; icons and fonts need telling.
+    """
+    paths = {str(p) for p in paths}
+    for path in paths:
+        ICONS.invalidate(path)
+
+    font_paths = {str(p) for family in _families.values() for p in family.paths}
+    if paths & font_paths:
+        FONTS.clear()
+        METRICS.clear()
+        OUTLINES.clear()
+        _families.clear()
+
+# ======================
+# Fonts
+# ======================
+TITLE_FONT = "fonts/UncialAntiqua-Regular.ttf"
+BODY_FONT = "fonts/LibreBaskerville-Regular.ttf"
+BOLD_FONT = "fonts/LibreBaskerville-Bold.ttf"
+ITALIC_FONT = "fonts/LibreBaskerville-Italic.ttf"
+
+FONT_FAMILIES = {
+    "title": ((TITLE_FONT,), 70),
+    "body": ((BODY_FONT, BOLD_FONT, ITALIC_FONT), 35)
+}
+_families = {}
+
+def font_family(role):
+    """The "title" or "body" FontFamily, loaded on first use."""
+    family = _families.get(role)
+    if family is None:
+        files, size = FONT_FAMILIES[role]
+        family = FONTS.family(*(ASSET_ROOT / f for f in files), size=size)
+        _families[role] = family
+    return family
+
+# ======================
+# Debug layout + grid
+# ======================
+def debug_draw_box(draw, box, color=(255, 255, 255, 255), label=None, scale=1.0):
+    if not DEBUG_LAYOUT:
+        return
+
+    if not hasattr(draw, "_grid_drawn"):
+        img_w, img_h = draw.im.size
+
+        # Vertical grid
+        x = 0
+        while x <= img_w:
+            draw.line([(x, 0), (x, img_h)], fill=GRID_COLOR, width=GRID_THICKNESS)
+            x += GRID_WIDTH * scale
+
+        # Horizontal grid
+        y = 0
+        while y <= img_h:
+            draw.line([(0, y), (img_w, y)], fill=GRID_COLOR, width=GRID_THICKNESS)
+            y += GRID_HEIGHT * scale
+
+        draw._grid_drawn = True
+
+    box = scaled_box(box, scale)
+    x, y = box["x"], box["y"]
+    w, h = box["width"], box["height"]
+
+    draw.rectangle([x, y, x + w, y + h], outline=color, width=max(1, round(2 * scale)))
+
+    if label:
+        font = None if scale == 1 else ImageFont.load_default(10 * scale)
+        draw.text((x + 4 * scale, y + 4 * scale), label, fill=color, font=font)
+
+# ======================
+# Centered markup rendering
+# ======================
+def layout_centered_box(text, box, fonts):
+    """Lay out text centered in box by its ink bbox; returns (layout, origin)."""
+    layout = layout_markup(text, fonts, box["width"])
+
+    bbox = layout.ink_bbox
+    if not bbox:
+        return None
+
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    start_x = box["x"] + (box["width"] - text_width) // 2
+    start_y = box["y"] + (box["height"] - text_height) // 2
+
+    return layout, (start_x, start_y)
+
+# ======================
+# Card inputs
+# ======================
+def card_stem(item):
+    """Output file name stem: the item's "stem" if set, else its lowercased name."""
+    return item.get("stem") or item["name"].lower().replace(" ", "_")
+
+def card_icons(item):
+    names = set()
+    for field in ("name", "type", "description", "flavor"):
+        if field not in item:
+            continue
+        for para in compile_markup(item[field]).paragraphs:
+            for line in para:
+                names.update(t[1] for t in line.tokens if t[0] == "icon")
+    return names
+
+def card_inputs(item):
+    """Every file the rendered card depends on."""
+    template_name = item.get("template", "default")
+    # Registers the template's icon set, so icons resolve as the render will
+    layout = prepare_template(template_name)
+
+    inputs = list(template_files(template_name, layout, TEMPLATES.root))
+    inputs.append(ART.root / item["image"])
+    inputs.extend(font_family("title").paths + font_family("body").paths)
+
+    for name in card_icons(item):
+        path = ICONS.path(name, template_name)
+        if path:
+            inputs.append(path)
+
+    return inputs
+
+# ======================
+# Preview scale
+# ======================
+# A card can be rendered at any scale of its layout.json size. Text is
+# always laid out at full size, then painted with scaled positions and
+# fonts, so line breaks match the full-size card exactly.
+def scaled_box(box, scale):
+    if scale == 1:
+        return box
+    return dict(box, **{k: round(box[k] * scale) for k in ("x", "y", "width", "height")})
+
+# ======================
+# Static card layer
+# ======================
+# Everything under the text only depends on (template, rarity, art, whether
+# a flavor box is drawn): recolored frame, base, debug overlay and the art.
+# It is built once and each card paints its text on a copy.
+STATIC_LAYER_LIMIT = 16
+_static_layers = OrderedDict()
+
+def static_layer(item, layout, template_name, scale=1.0):
+    """Shared undecorated card for item. Callers must copy() before drawing."""
+    rarity = item.get("rarity", "Common")
+    has_flavor = "flavor" in item
+    key = (template_name, rarity, item["image"], has_flavor, scale)
+
+    base = TEMPLATES.card_layer(template_name, rarity, scale)
+    art_box = scaled_box(layout["art"], scale)
+    art = ART.get(item["image"], (art_box["width"], art_box["height"]))
+
+    entry = _static_layers.get(key)
+    if entry is not None and entry[0] is base and entry[1] is art:
+        _static_layers.move_to_end(key)
+        PROFILER.count("static_layer.hit")
+        return entry[2]
+
+    PROFILER.count("static_layer.miss")
+    with PROFILER.stage("static_layer"):
+        layer = build_static_layer(item, layout, template_name, base, art, scale)
+
+    _static_layers[key] = (base, art, layer)
+    while len(_static_layers) > STATIC_LAYER_LIMIT:
+        _static_layers.popitem(last=False)
+
+    return layer
+
+def build_static_layer(item, layout, template_name, base, art, scale=1.0):
+    layer = base.copy()
+    draw = ImageDraw.Draw(layer)
+
+    debug_draw_box(draw, layout["title"], label="TITLE", scale=scale)
+    debug_draw_box(draw, layout["subtitle"], label="SUBTITLE", scale=scale)
+
+    _, assets = TEMPLATES.load(template_name)
+    mask = assets["mask"]
+    if mask and mask.size != art.size:
+        mask = mask.resize(art.size, Image.Resampling.BILINEAR)
+    art_box = scaled_box(layout["art"], scale)
+    layer.paste(art, (art_box["x"], art_box["y"]), mask if mask else art)
+
+    debug_draw_box(draw, layout["description"], label="DESCRIPTION", scale=scale)
+    if "flavor" in item:
+        debug_draw_box(draw, layout["flavor"], label="FLAVOR", scale=scale)
+
+    return layer
+
+# ======================
+# Text regions
+# ======================
+TEXT_REGIONS = ("title", "subtitle", "description", "flavor")
+
+def layout_region(item, layout, region):
+    """Lay out one text region of item; returns (layout, origin) or None."""
+    box = layout[region]
+
+    if region == "title":
+        return layout_centered_box(item["name"], box, font_family("title"))
+
+    if region == "subtitle":
+        text_layout = layout_markup(item["type"], font_family("body"), box["width"], align="center")
+        return text_layout, (box["x"], box["y"])
+
+    if region == "flavor" and "flavor" not in item:
+        return None
+
+    try:
+        sizes = size_grid(box.get("font_sizes"), font_family("body").size)
+    except ValueError as e:
+        raise ValueError(f"layout.json {region}: {e}") from None
+
+    text = item["description"] if region == "description" else f'— {item["flavor"]}'
+    text_layout = fit_markup(
+        text,
+        font_family("body"),
+        box["width"],
+        box["height"],
+        sizes=sizes
+    )
+    return text_layout, (box["x"], box["y"])
+
+def region_bbox(placed):
+    text_layout, (x, y) = placed
+    bbox = text_layout.ink_bbox
+    if not bbox:
+        return None
+    return (
+        math.floor(x + bbox[0]),
+        math.floor(y + bbox[1]),
+        math.ceil(x + bbox[2]),
+        math.ceil(y + bbox[3])
+    )
+
+def paint_regions(image, placed, template_name, offset=(0, 0), scale=1.0):
+    draw = ImageDraw.Draw(image)
+    for text_layout, (x, y) in placed:
+        paint_layout(
+            text_layout,
+            image,
+            draw,
+            (x - offset[0]) * scale,
+            (y - offset[1]) * scale,
+            TEXT_COLOR,
+            icon_set=template_name,
+            scale=scale
+        )
+
+def prepare_template(template_name):
+    layout, _ = TEMPLATES.load(template_name)
+
+    if "icons" in layout:
+        template_dir = TEMPLATES.root / template_name
+        ICONS.register_set(
+            template_name,
+            {k: template_dir / v for k, v in layout["icons"].items()}
+        )
+
+    return layout
+
+# ======================
+# Generate card
+# ======================
+def compose_card(item, scale=1.0):
+    template_name = item.get("template", "default")
+    layout = prepare_template(template_name)
+
+    card = static_layer(item, layout, template_name, scale).copy()
+
+    with PROFILER.stage("layout_text"):
+        placed = [layout_region(item, layout, region) for region in TEXT_REGIONS]
+    paint_regions(card, [p for p in placed if p], template_name, scale=scale)
+
+    return card
+
+def rerender_region(card, item, region, previous=None, scale=1.0):
+    """
+    Repaint one text region of a card composed for the same template,
+    rarity and art. The area under the region's box and its old and new ink
+    is restored from the static layer, and every region reaching into that
+    area is painted again there, so overlapping text stays intact.
+    `previous` is the item the card was rendered from, if its text changed;
+    `scale` is the one the card was rendered at.
+    """
+    template_name = item.get("template", "default")
+    layout = prepare_template(template_name)
+    static = static_layer(item, layout, template_name, scale)
+
+    box = layout[region]
+    rects = [(box["x"], box["y"], box["x"] + box["width"], box["y"] + box["height"])]
+    for source in (item, previous):
+        placed = layout_region(source, layout, region) if source else None
+        bbox = region_bbox(placed) if placed else None
+        if bbox:
+            rects.append(bbox)
+
+    # Full-size layout coordinates, then card pixels. Scaled text keeps
+    # outlines at least a pixel wide and rounds its positions, so its ink can
+    # reach a little past the scaled bbox
+    bounds = (
+        min(r[0] for r in rects),
+        min(r[1] for r in rects),
+        max(r[2] for r in rects),
+        max(r[3] for r in rects)
+    )
+    margin = 0 if scale == 1 else 2
+    area = (
+        max(0, math.floor(bounds[0] * scale) - margin),
+        max(0, math.floor(bounds[1] * scale) - margin),
+        min(card.width, math.ceil(bounds[2] * scale) + margin),
+        min(card.height, math.ceil(bounds[3] * scale) + margin)
+    )
+    bounds = tuple(v / scale for v in area)
+
+    patch = static.crop(area)
+    touching = []
+    for name in TEXT_REGIONS:
+        placed = layout_region(item, layout, name)
+        bbox = region_bbox(placed) if placed else None
+        if bbox and bbox[0] < bounds[2] and bbox[2] > bounds[0] and bbox[1] < bounds[3] and bbox[3] > bounds[1]:
+            touching.append(placed)
+
+    paint_regions(patch, touching, template_name, offset=bounds[:2], scale=scale)
+    card.paste(patch, area[:2])
+    return card
+
+
+# ======================
+# Library API
+# ======================
+def render_card(item, scale=1.0):
+    """
+    Render item to a new RGBA image. Safe to call repeatedly; assets stay
+    cached. `scale` renders a preview at that fraction of the full size
+    with the same line breaks.
+    """
+    with PROFILER.card(card_stem(item)):
+        return compose_card(item, scale)
+
+def render_card_bytes(item, format="png", scale=1.0):
+    """
+    Render item and encode it in memory. `format` is anything -o accepts,
+    e.g. "png", "webp:quality=80" or "jpeg:width=400".
+    """
+    spec = parse_output(format) if isinstance(format, str) else format
+    buffer = io.BytesIO()
+    encode_image(render_card(item, scale), buffer, spec, DPI * scale)
+    return buffer.getvalue()
+
+configure()
@@ -0,0 +1,137 @@
+import json
+import os
+from collections import namedtuple
+from pathlib import Path
+import cards
+from art import ART
+from cards import TEXT_REGIONS, font_family, layout_region, card_icons
+from icons import ICONS
+from markup import compile_markup, size_grid
+from templates import TEMPLATES
+
+# ======================
+# Reports
+# ======================
+Issue = namedtuple("Issue", "field message")
+RegionReport = namedtuple("RegionReport", "region size min_size overflow")
+
+class CardReport(namedtuple("CardReport", "name regions issues")):
+    def __str__(self):
+        sizes = ", ".join(
+            f"{r.region} {r.size}pt" + (f" (+{r.overflow}px)" if r.overflow > 0 else "")
+            for r in self.regions
+        )
+        lines = [f"{self.name}: {sizes}" if sizes else self.name]
+        lines.extend(f"  {issue.field}: {issue.message}" for issue in self.issues)
+        return "\n".join(lines)
+
+# ======================
+# Deck checker
+# ======================
+_layouts = {}
+
+def template_layout(name):
+    """
+    Parsed layout.json for a template, with its icon set registered. Reads
+    no images, unlike TEMPLATES.load().
+    """
+    layout = _layouts.get(name)
+    if layout is None:
+        base = TEMPLATES.root / name
+        with open(base / "layout.json", "r") as f:
+            layout = json.load(f)
+        if "icons" in layout:
+            ICONS.register_set(name, {k: base / v for k, v in layout["icons"].items()})
+        _layouts[name] = layout
+    return layout
+
+def missing_files(item, template_name, layout):
+    base = TEMPLATES.root / template_name
+    files = [base / "base.png", base / "frame.png", ART.root / item["image"]]
+    if layout["art"].get("mask"):
+        files.append(base / layout["art"]["mask"])
+    for role in cards.FONT_FAMILIES:
+        files.extend(Path(p) for p in font_family(role).paths)
+
+    for name in card_icons(item):
+        path = ICONS.path(name, template_name)
+        if path:
+            files.append(Path(path))
+
+    return sorted({str(p) for p in files if not os.path.exists(p)})
+
+def check_region(item, layout, region):
+    """Lay out one region as a render would; returns (RegionReport, issues)."""
+    box = layout[region]
+    try:
+        placed = layout_region(item, layout, region)
+    except ValueError as e:
+        return None, [Issue(region, str(e))]
+    if placed is None:
+        return None, []
+
+    text_layout, _ = placed
+    issues = []
+    size = text_layout.fonts.size
+
+    widest = max((line.x + line.width for line in text_layout.lines), default=0)
+    overflow = text_layout.height - box["height"]
+    if region == "title":
+        # Centered by ink, so only the ink has to fit
+        left, top, right, bottom = text_layout.ink_bbox
+        widest = right - left
+        overflow = bottom - top - box["height"]
+
+    if widest > box["width"]:
+        issues.append(Issue(region, f"text is {round(widest - box['width'])}px wider than its box"))
+    min_size = None
+    if region in ("description", "flavor"):
+        min_size = size_grid(box.get("font_sizes"), font_family("body").size)[-1]
+        if size == min_size:
+            issues.append(Issue(region, f"autoscaled down to the minimum {size}pt"))
+    if overflow > 0:
+        issues.append(Issue(region, f"overflows its box by {overflow}px"))
+
+    return RegionReport(region, size, min_size, max(0, overflow)), issues
+
+def check_card(item):
+    """
+    Parse and measure every text box of item against its template without
+    compositing or decoding any images. Returns a CardReport.
+    """
+    name = item.get("name", "?")
+    issues = []
+
+    for field in ("name", "type", "image", "description"):
+        if field not in item:
+            issues.append(Issue(field, "missing"))
+    if issues:
+        return CardReport(name, (), tuple(issues))
+
+    template_name = item.get("template", "default")
+    try:
+        layout = template_layout(template_name)
+    except (OSError, ValueError) as e:
+        return CardReport(name, (), (Issue("template", f"{template_name}: {e}"),))
+
+    for field in ("name", "type", "description", "flavor"):
+        if field not in item:
+            continue
+        for diagnostic in compile_markup(item[field]).diagnostics:
+            issues.append(Issue(field, str(diagnostic)))
+
+    for icon in sorted(card_icons(item)):
+        if not ICONS.path(icon, template_name):
+            issues.append(Issue("icons", f"unknown icon {{icon:{icon}}}"))
+
+    for path in missing_files(item, template_name, layout):
+        issues.append(Issue("files", f"missing {path}"))
+
+    regions = []
+    for region in TEXT_REGIONS:
+        report, found = check_region(item, layout, region)
+        if report:
+            regions.append(report)
+        issues.extend(found)
+
+    return CardReport(name, tuple(regions), tuple(issues))
@@ -0,0 +1,166 @@
+import json
+import re
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16
+
+# What a value cut off at the end of a chunk can look like
+LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+NUMBER_PREFIX = re.compile(r"-?\d*(\.\d*)?([eE][-+]?\d*)?")
+
+# ======================
+# JSONL decks
+# ======================
+def iter_jsonl(f, errors):
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append((lineno, f"invalid JSON: {e.msg} (column {e.colno})"))
+            continue
+        if not isinstance(item, dict):
+            errors.append((lineno, "item is not an object"))
+            continue
+        yield item
+
+# ======================
+# JSON decks
+# ======================
+class _Reader:
+    """Incremental JSON value reader over a text stream."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of input."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def truncated(self, error):
+        """Whether decoding failed only because the value runs past the buffer."""
+        if error.pos >= len(self.buf) or error.msg.startswith("Unterminated string"):
+            return True
+        tail = self.buf[error.pos:]
+        if error.msg.startswith("Invalid \\uXXXX escape"):
+            return len(tail) < 6
+        return any(literal.startswith(tail) for literal in LITERALS) or bool(NUMBER_PREFIX.fullmatch(tail))
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Might just be cut off at the chunk boundary; anything else is
+                # malformed, and reading on would only pull in the whole file
+                if self.truncated(e) and self.fill():
+                    continue
+                raise
+            # A number running to the end of the buffer may continue in the
+            # next chunk, even if only part of it decoded ("1." -> 1)
+            if not self.eof and NUMBER_PREFIX.fullmatch(self.buf, self.pos) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_json_array(reader, errors):
+    reader.expect("[")
+    index = 0
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+
+    while True:
+        try:
+            item = reader.value()
+        except json.JSONDecodeError as e:
+            # No reliable way to resync inside an array; stop here
+            errors.append((index, f"invalid JSON: {e.msg}"))
+            return
+
+        if isinstance(item, dict):
+            yield item
+        else:
+            errors.append((index, "item is not an object"))
+        index += 1
+
+        sep = reader.peek()
+        if sep == ",":
+            reader.pos += 1
+        elif sep == "]":
+            reader.pos += 1
+            return
+        else:
+            errors.append((index, f"expected ',' or ']' but found {sep!r}"))
+            return
+
+def iter_json(f, errors):
+    """Stream items from a top-level array or an {"items": [...]} object."""
+    reader = _Reader(f)
+
+    try:
+        if reader.peek() == "[":
+            yield from iter_json_array(reader, errors)
+            return
+
+        reader.expect("{")
+        while reader.peek() not in ("}", ""):
+            key = reader.value()
+            reader.expect(":")
+            if key == "items":
+                yield from iter_json_array(reader, errors)
+                return
+            else:
+                reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+    except ValueError as e:
+        errors.append(("deck", str(e)))
+
+# ======================
+# Deck input
+# ======================
+def iter_items(path, errors=None):
+    """
+    Yield deck items one at a time from a .jsonl file (one item per line) or
+    a .json file, without loading the whole deck. Malformed entries are
+    appended to `errors` as (line or index, message) and skipped.
+    """
+    if errors is None:
+        errors = []
+
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            yield from iter_jsonl(f, errors)
+        else:
+            yield from iter_json(f, errors)
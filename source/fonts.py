@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from PIL import ImageFont
+from profiling import PROFILER
+
+# ======================
+# Font registry
+# ======================
+class FontRegistry:
+    """
+    Hands out shared FreeTypeFont objects keyed by (path, size, variation).
+    FreeType face loading is far more expensive than measuring, so fonts are
+    kept in an LRU instead of being reloaded for every autoscale step.
+    """
+
+    def __init__(self, max_fonts=64):
+        self.max_fonts = max_fonts
+        self._fonts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, size, variation=None):
+        key = (str(path), size, variation)
+        font = self._fonts.get(key)
+        if font is not None:
+            self._fonts.move_to_end(key)
+            self.hits += 1
+            return font
+
+        self.misses += 1
+        PROFILER.count("font.load")
+        with PROFILER.stage("font_load"):
+            font = ImageFont.truetype(str(path), size)
+            if isinstance(variation, str):
+                font.set_variation_by_name(variation)
+            elif variation is not None:
+                font.set_variation_by_axes(list(variation))
+        font.cache_key = key
+
+        self._fonts[key] = font
+        while len(self._fonts) > self.max_fonts:
+            self._fonts.popitem(last=False)
+
+        return font
+
+    def scaled(self, font, scale):
+        """A font loaded by get(), at `scale` times its size."""
+        if scale == 1:
+            return font
+        path, size, variation = font.cache_key
+        return self.get(path, round(size * scale, 2), variation)
+
+    def family(self, normal, bold=None, italic=None, bolditalic=None, size=35, variation=None):
+        return FontFamily(self, normal, bold, italic, bolditalic, size, variation)
+
+    def clear(self):
+        self._fonts.clear()
+
+# ======================
+# Font family
+# ======================
+class FontFamily:
+    """
+    normal/bold/italic/bolditalic faces at a single size. Missing styles
+    fall back to normal (and bolditalic to bold).
+    """
+
+    __slots__ = ("registry", "paths", "size", "variation",
+                 "normal", "bold", "italic", "bolditalic")
+
+    def __init__(self, registry, normal, bold=None, italic=None, bolditalic=None, size=35, variation=None):
+        bold = bold or normal
+        italic = italic or normal
+        bolditalic = bolditalic or bold
+
+        self.registry = registry
+        self.paths = (str(normal), str(bold), str(italic), str(bolditalic))
+        self.size = size
+        self.variation = variation
+
+        self.normal = registry.get(normal, size, variation)
+        self.bold = registry.get(bold, size, variation)
+        self.italic = registry.get(italic, size, variation)
+        self.bolditalic = registry.get(bolditalic, size, variation)
+
+    def at(self, size):
+        if size == self.size:
+            return self
+        return FontFamily(self.registry, *self.paths, size=size, variation=self.variation)
+
+    def pick(self, bold=False, italic=False):
+        if bold and italic:
+            return self.bolditalic
+        if bold:
+            return self.bold
+        if italic:
+            return self.italic
+        return self.normal
+
+    def __repr__(self):
+        return f"FontFamily({self.paths[0]!r}, size={self.size})"
+
+FONTS = FontRegistry()
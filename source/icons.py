@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from profiling import PROFILER
+from rawcache import RAW
+
+ICON_MAP = {
+    "fire": "icons/fire.png",
+    "lightning": "icons/lightning.png",
+    "frost": "icons/frost.png",
+    "melee": "icons/melee.png",
+    "shield": "icons/shield.png",
+    "heart": "icons/heart.png",
+    "rooted": "icons/rooted.png",
+    "poison": "icons/poison.png",
+    "magic": "icons/magic.png",
+    "armorbroken": "icons/armorbroken.png",
+    "ignited": "icons/ignited.png",
+    "dragon": "icons/dragon.png",
+    "blood": "icons/blood.png",
+    "eye": "icons/eye.png"
+}
+
+# ======================
+# Icon store
+# ======================
+class IconStore:
+    """
+    Decodes every icon once and keeps resized variants keyed by
+    (path, size) in an LRU so autoscaled text doesn't re-decode PNGs.
+    Templates can register their own icon sets; names missing from a set
+    fall back to the default ICON_MAP.
+    """
+
+    def __init__(self, icon_map=ICON_MAP, max_variants=256):
+        self.default = dict(icon_map)
+        self.sets = {}
+        self.max_variants = max_variants
+        self._sources = {}
+        self._variants = OrderedDict()
+
+    def reset(self, icon_map):
+        """Swap in a new default map, forgetting template sets and decoded icons."""
+        self.default = {k: str(v) for k, v in icon_map.items()}
+        self.sets.clear()
+        self.invalidate()
+
+    def register_set(self, set_name, icon_map):
+        icon_map = {k: str(v) for k, v in icon_map.items()}
+        if self.sets.get(set_name) == icon_map:
+            return
+        self.sets[set_name] = icon_map
+
+    def path(self, name, icon_set=None):
+        if icon_set is not None:
+            path = self.sets.get(icon_set, {}).get(name)
+            if path:
+                return path
+        return self.default.get(name)
+
+    def _source(self, path):
+        src = self._sources.get(path)
+        if src is None:
+            src = RAW.decoded(path)
+            self._sources[path] = src
+        return src
+
+    def preload(self):
+        for path in self.default.values():
+            self._source(path)
+        for icon_map in self.sets.values():
+            for path in icon_map.values():
+                self._source(path)
+
+    def get(self, name, size, icon_set=None):
+        path = self.path(name, icon_set)
+        if not path:
+            return None
+
+        key = (path, size)
+        icon = self._variants.get(key)
+        if icon is not None:
+            self._variants.move_to_end(key)
+            PROFILER.count("icon.hit")
+            return icon
+
+        PROFILER.count("icon.miss")
+        with PROFILER.stage("icon_load"):
+            raw_key = RAW.key(RAW.digest(path), size)
+            icon = RAW.get("icon", raw_key, lambda: self._source(path).resize((size, size)))
+        self._variants[key] = icon
+        while len(self._variants) > self.max_variants:
+            self._variants.popitem(last=False)
+
+        return icon
+
+    def invalidate(self, path=None):
+        if path is None:
+            self._sources.clear()
+            self._variants.clear()
+            return
+        path = str(path)
+        self._sources.pop(path, None)
+        for key in [k for k in self._variants if k[0] == path]:
+            del self._variants[key]
+
+ICONS = IconStore()
@@ -0,0 +1,287 @@
+import sys
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageOps
+
+MM_PER_INCH = 25.4
+
+PAPER_SIZES = {
+    "a4": (210.0, 297.0),
+    "letter": (215.9, 279.4)
+}
+
+TTS_COLUMNS = 10
+TTS_ROWS = 7
+
+def mm_to_px(mm, dpi):
+    return round(mm / MM_PER_INCH * dpi)
+
+# ======================
+# Bleed
+# ======================
+def add_bleed(card, bleed):
+    """Extend the card's edge pixels outwards by `bleed` pixels on every side."""
+    if bleed <= 0:
+        return card
+
+    w, h = card.size
+    out = Image.new(card.mode, (w + 2 * bleed, h + 2 * bleed))
+    out.paste(card, (bleed, bleed))
+
+    out.paste(card.crop((0, 0, w, 1)).resize((w, bleed)), (bleed, 0))
+    out.paste(card.crop((0, h - 1, w, h)).resize((w, bleed)), (bleed, h + bleed))
+    out.paste(card.crop((0, 0, 1, h)).resize((bleed, h)), (0, bleed))
+    out.paste(card.crop((w - 1, 0, w, h)).resize((bleed, h)), (w + bleed, bleed))
+
+    corners = (
+        ((0, 0), (0, 0)),
+        ((w - 1, 0), (w + bleed, 0)),
+        ((0, h - 1), (0, h + bleed)),
+        ((w - 1, h - 1), (w + bleed, h + bleed))
+    )
+    for src, dst in corners:
+        out.paste(card.getpixel(src), dst + (dst[0] + bleed, dst[1] + bleed))
+
+    return out
+
+# ======================
+# Fitting
+# ======================
+def fit_card(card, size, background):
+    """
+    Scale card uniformly to fit within size and center it on a canvas of
+    exactly that size. Never stretches, unlike a plain resize.
+    """
+    if card.size == tuple(size):
+        return card
+    fitted = ImageOps.contain(card, size, Image.Resampling.LANCZOS)
+    canvas = Image.new(card.mode, size, background)
+    canvas.paste(fitted, ((size[0] - fitted.width) // 2, (size[1] - fitted.height) // 2))
+    return canvas
+
+# ======================
+# Sheet writers
+# ======================
+class SheetWriter:
+    """
+    Places cards into fixed grid slots and writes each sheet as soon as it
+    is full, so at most one sheet's pixels are held at a time.
+    """
+
+    def __init__(self, output_dir, name, columns, rows, slot_size, sheet_size, origin=(0, 0), slots=None):
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.slot_size = slot_size
+        self.sheet_size = sheet_size
+        self.origin = origin
+        self.slots = slots or columns * rows
+        self.sheet = None
+        self.filled = 0
+        self.count = 0
+        self.written = []
+        self.warned = False
+
+    def slot_position(self, index):
+        col, row = index % self.columns, index // self.columns
+        return (
+            self.origin[0] + col * self.slot_size[0],
+            self.origin[1] + row * self.slot_size[1]
+        )
+
+    def new_sheet(self):
+        return Image.new("RGB", self.sheet_size, (255, 255, 255))
+
+    def place(self, card):
+        """Fit the card into a slot: centered, shrunk uniformly only if it's larger."""
+        if card.size != self.slot_size:
+            self.warn_size(card, self.slot_size)
+        if card.width > self.slot_size[0] or card.height > self.slot_size[1]:
+            card = ImageOps.contain(card, self.slot_size, Image.Resampling.LANCZOS)
+        return card
+
+    def warn_size(self, card, size):
+        if not self.warned:
+            print(
+                f"Warning: {self.name}: card is {card.width}x{card.height} but its sheet slots "
+                f"are {size[0]}x{size[1]}; fitting it without stretching",
+                file=sys.stderr
+            )
+            self.warned = True
+
+    def add(self, card):
+        if self.sheet is None:
+            self.sheet = self.new_sheet()
+
+        card = self.place(card)
+        x, y = self.slot_position(self.filled)
+        x += (self.slot_size[0] - card.width) // 2
+        y += (self.slot_size[1] - card.height) // 2
+        self.sheet.paste(card, (x, y), card if card.mode == "RGBA" else None)
+
+        self.filled += 1
+        if self.filled == self.slots:
+            self.flush()
+
+    def finish_sheet(self, sheet):
+        return sheet
+
+    def save_sheet(self, sheet, index):
+        path = self.output_dir / f"{self.name}_{index:03d}.png"
+        sheet.save(path)
+        return path
+
+    def flush(self):
+        if self.sheet is None:
+            return
+        self.count += 1
+        path = self.save_sheet(self.finish_sheet(self.sheet), self.count)
+        self.written.append(path)
+        self.sheet = None
+        self.filled = 0
+
+    def close(self):
+        self.flush()
+        return self.written
+
+class PrintSheets(SheetWriter):
+    """
+    Paper sheets (A4/Letter) at the card DPI. Each card gets `bleed_mm` of
+    edge-extended bleed, and crop marks run from the trim lines into the
+    page margin. Pages are appended to one PDF, or written as PNGs.
+    """
+
+    def __init__(self, output_dir, name, card_size, dpi, paper="a4", bleed_mm=3.0, margin_mm=10.0, fmt="pdf"):
+        page = tuple(mm_to_px(mm, dpi) for mm in PAPER_SIZES[paper])
+        margin = mm_to_px(margin_mm, dpi)
+        self.bleed = mm_to_px(bleed_mm, dpi)
+        self.card_size = tuple(card_size)
+        self.dpi = dpi
+        self.fmt = fmt
+
+        slot = (card_size[0] + 2 * self.bleed, card_size[1] + 2 * self.bleed)
+        columns = max(1, (page[0] - 2 * margin) // slot[0])
+        rows = max(1, (page[1] - 2 * margin) // slot[1])
+        origin = (
+            (page[0] - columns * slot[0]) // 2,
+            (page[1] - rows * slot[1]) // 2
+        )
+
+        super().__init__(output_dir, name, columns, rows, slot, page, origin)
+
+    def place(self, card):
+        card = card.convert("RGB")
+        if card.size != self.card_size:
+            self.warn_size(card, self.card_size)
+            card = fit_card(card, self.card_size, (255, 255, 255))
+        return add_bleed(card, self.bleed)
+
+    def finish_sheet(self, sheet):
+        draw = ImageDraw.Draw(sheet)
+        columns = self.columns
+        rows = (self.filled + columns - 1) // columns
+        left, top = self.origin
+        right = left + columns * self.slot_size[0]
+        bottom = top + rows * self.slot_size[1]
+        width = max(1, self.dpi // 150)
+
+        trims_x = sorted({left + c * self.slot_size[0] + self.bleed + off
+                          for c in range(columns) for off in (0, self.card_size[0])})
+        trims_y = sorted({top + r * self.slot_size[1] + self.bleed + off
+                          for r in range(rows) for off in (0, self.card_size[1])})
+
+        # Marks stop short of the bleed so they never touch card pixels
+        for x in trims_x:
+            draw.line([(x, 0), (x, top - self.bleed)], fill=(0, 0, 0), width=width)
+            draw.line([(x, bottom + self.bleed), (x, sheet.height)], fill=(0, 0, 0), width=width)
+        for y in trims_y:
+            draw.line([(0, y), (left - self.bleed, y)], fill=(0, 0, 0), width=width)
+            draw.line([(right + self.bleed, y), (sheet.width, y)], fill=(0, 0, 0), width=width)
+
+        return sheet
+
+    def save_sheet(self, sheet, index):
+        if self.fmt != "pdf":
+            return super().save_sheet(sheet, index)
+
+        path = self.output_dir / f"{self.name}.pdf"
+        sheet.save(path, "PDF", resolution=self.dpi, quality=95, append=index > 1)
+        return path
+
+    def close(self):
+        self.flush()
+        return sorted(set(self.written))
+
+class TTSSheets(SheetWriter):
+    """
+    Tabletop Simulator deck sheets: a 10x7 grid of cards where the last slot
+    holds the card back (TTS shows it for hidden cards).
+    """
+
+    def __init__(self, output_dir, name, card_size, back=None):
+        card_size = tuple(card_size)
+        sheet = (card_size[0] * TTS_COLUMNS, card_size[1] * TTS_ROWS)
+        super().__init__(
+            output_dir,
+            name,
+            TTS_COLUMNS,
+            TTS_ROWS,
+            card_size,
+            sheet,
+            slots=TTS_COLUMNS * TTS_ROWS - 1
+        )
+        self.back = back
+
+    def new_sheet(self):
+        sheet = Image.new("RGB", self.sheet_size, (0, 0, 0))
+        if self.back is not None:
+            back = fit_card(self.back.convert("RGBA"), self.slot_size, (0, 0, 0, 0))
+            sheet.paste(back, self.slot_position(self.slots), back)
+        return sheet
+
+# ======================
+# Imposition stage
+# ======================
+SHEET_KINDS = ("a4", "letter", "tts")
+
+class Imposer:
+    """
+    Feeds rendered cards into one sheet writer per (kind, template), in deck
+    order. Sheet geometry comes from the pixel size of the template's first
+    card and the DPI; later cards of another size are fitted, never stretched.
+    """
+
+    def __init__(self, output_dir, kinds, dpi, bleed_mm=3.0, back=None, fmt="pdf"):
+        self.output_dir = Path(output_dir)
+        self.kinds = tuple(kinds)
+        self.dpi = dpi
+        self.bleed_mm = bleed_mm
+        self.back = back
+        self.fmt = fmt
+        self.writers = {}
+
+    def writer(self, kind, template_name, card_size):
+        key = (kind, template_name)
+        writer = self.writers.get(key)
+        if writer is None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{template_name}_{kind}"
+            if kind == "tts":
+                writer = TTSSheets(self.output_dir, name, card_size, back=self.back)
+            else:
+                writer = PrintSheets(
+                    self.output_dir, name, card_size, self.dpi,
+                    paper=kind, bleed_mm=self.bleed_mm, fmt=self.fmt
+                )
+            self.writers[key] = writer
+        return writer
+
+    def add(self, card, template_name):
+        for kind in self.kinds:
+            self.writer(kind, template_name, card.size).add(card)
+
+    def close(self):
+        written = []
+        for writer in self.writers.values():
+            written.extend(writer.close())
+        return written
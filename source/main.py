@@ -1,309 +1,477 @@
-import json
+import argparse
+import os
+import sys
+import time
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-from markup import render_markup, COLOR_MAP
-import copy
+from PIL import Image
+import cards
+from cards import compose_card, card_stem, card_inputs
+from markup import compile_markup
+from batch import render_deck, Progress
+from deck import iter_items
+from manifest import Manifest
+from imposition import Imposer, SHEET_KINDS
+from output import OutputWriter, parse_output, output_names, DEFAULT_OUTPUTS
+from profiling import PROFILER
+from watch import DependencyGraph, FileWatcher
+from check import check_card
+from store import DeckStore, is_store, parse_query, parse_timestamp
+
+# Command line front end; the rendering itself lives in cards.py.
 
-# ======================
-# Configuration
-# ======================
-DEBUG_LAYOUT = True
+OUTPUT_DIR = Path("output")
 
-GRID_WIDTH = 50
-GRID_HEIGHT = 50
-GRID_COLOR = (0, 255, 255, 120)
-GRID_THICKNESS = 1
+# Scaled runs (--scale) write here, with their own manifest, so a quick
+# preview never replaces the full-size cards in OUTPUT_DIR
+PREVIEW_DIR = OUTPUT_DIR / "preview"
 
-DPI = 300
-TEXT_COLOR = COLOR_MAP["default"]
+# Set up by main() once outputs and encoder threads are known
+WRITER = None
 
-OUTPUT_DIR = Path("output")
-OUTPUT_DIR.mkdir(exist_ok=True)
+# Fraction of the full card size to render at (--scale)
+RENDER_SCALE = 1.0
+
+# Filters for a deck store (--where, --changed-since)
+DECK_QUERY = ()
+CHANGED_SINCE = None
 
 # ======================
-# Fonts
+# Deck input
 # ======================
-title_font = ImageFont.truetype("fonts/UncialAntiqua-Regular.ttf", 70)
-subtitle_font = ImageFont.truetype("fonts/LibreBaskerville-Regular.ttf", 35)
-body_font = ImageFont.truetype("fonts/LibreBaskerville-Regular.ttf", 35)
-bold_font = ImageFont.truetype("fonts/LibreBaskerville-Bold.ttf", 35)
-italic_font = ImageFont.truetype("fonts/LibreBaskerville-Italic.ttf", 35)
-
-fonts_dict = {
-    "normal": body_font,
-    "bold": bold_font,
-    "italic": italic_font
-}
+def read_deck(path, errors):
+    """Items from a .json/.jsonl deck, or the matching items of a deck store."""
+    if is_store(path):
+        return DeckStore(path).items(DECK_QUERY, CHANGED_SINCE)
+    return iter_items(path, errors)
+
+def deck_subset():
+    """True when only part of the deck is read, so missing cards aren't gone."""
+    return bool(DECK_QUERY) or CHANGED_SINCE is not None
 
 # ======================
-# Auto Scale Font
+# Markup warnings
 # ======================
-def render_markup_autoscale(
-    text,
-    card,
-    draw,
-    x,
-    y,
-    max_width,
-    fonts,
-    default_color,
-    max_height,
-    min_font_size=12,
-    line_spacing=6,
-):
-    """Reduce font size until text fits within max_height."""
-    font_size = fonts["normal"].size
-    temp_fonts = copy.deepcopy(fonts)
-
-    while font_size >= min_font_size:
-        for k, f in temp_fonts.items():
-            temp_fonts[k] = ImageFont.truetype(f.path, font_size)
-
-        dummy_img = Image.new("RGBA", (max_width, max_height))
-        dummy_draw = ImageDraw.Draw(dummy_img)
-
-        y_end = render_markup(
-            text,
-            dummy_img,
-            dummy_draw,
-            x,
-            y,
-            max_width,
-            temp_fonts,
-            default_color,
-            line_spacing=line_spacing,
-            measure_only=True
-        )
-
-        if y_end - y <= max_height:
-            break
-
-        font_size -= 1
-
-    render_markup(
-        text,
-        card,
-        draw,
-        x,
-        y,
-        max_width,
-        temp_fonts,
-        default_color,
-        line_spacing=line_spacing
-    )
+def warn_markup(item):
+    for field in ("name", "type", "description", "flavor"):
+        if field not in item:
+            continue
+        for diagnostic in compile_markup(item[field]).diagnostics:
+            print(f"Warning: {item['name']} {field} {diagnostic}")
 
 # ======================
-# Debug layout + grid
+# Card version
 # ======================
-def debug_draw_box(draw, box, color=(255, 255, 255, 255), label=None):
-    if not DEBUG_LAYOUT:
-        return
+def card_version():
+    return (cards.RENDERER_VERSION, cards.DPI, cards.DEBUG_LAYOUT, WRITER.outputs, RENDER_SCALE)
 
-    if not hasattr(draw, "_grid_drawn"):
-        img_w, img_h = draw.im.size
-
-        # Vertical grid
-        x = 0
-        while x <= img_w:
-            draw.line([(x, 0), (x, img_h)], fill=GRID_COLOR, width=GRID_THICKNESS)
-            x += GRID_WIDTH
-
-        # Horizontal grid
-        y = 0
-        while y <= img_h:
-            draw.line([(0, y), (img_w, y)], fill=GRID_COLOR, width=GRID_THICKNESS)
-            y += GRID_HEIGHT
-
-        draw._grid_drawn = True
+# ======================
+# Generate card
+# ======================
+def generate_card(item):
+    with PROFILER.card(card_stem(item)):
+        card = compose_card(item, RENDER_SCALE)
 
-    x, y = box["x"], box["y"]
-    w, h = box["width"], box["height"]
+        return WRITER.submit(card, card_stem(item))
 
-    draw.rectangle([x, y, x + w, y + h], outline=color, width=2)
+def generate_card_image(item):
+    """generate_card that also hands the card back, for imposition."""
+    with PROFILER.card(card_stem(item)):
+        card = compose_card(item, RENDER_SCALE)
 
-    if label:
-        draw.text((x + 4, y + 4), label, fill=color)
+        return WRITER.submit(card, card_stem(item)), card
 
 # ======================
-# Centered markup rendering
+# Worker setup
 # ======================
-def render_markup_centered_box(
-    text,
-    card,
-    draw,
-    box,
-    fonts,
-    color
-):
-    dummy = Image.new("RGBA", (box["width"], box["height"]), (0, 0, 0, 0))
-    dummy_draw = ImageDraw.Draw(dummy)
-
-    render_markup(
-        text,
-        dummy,
-        dummy_draw,
-        0,
-        0,
-        box["width"],
-        fonts,
-        color
-    )
-
-    bbox = dummy.getbbox()
-    if not bbox:
-        return
-
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-
-    start_x = box["x"] + (box["width"] - text_width) // 2
-    start_y = box["y"] + (box["height"] - text_height) // 2
-
-    render_markup(
-        text,
-        card,
-        draw,
-        start_x,
-        start_y,
-        box["width"],
-        fonts,
-        color
-    )
+def setup_worker(asset_root, scale=1.0, output_dir=None, outputs=()):
+    """
+    Rebuild main()'s render settings in a worker process, which may have
+    been spawned rather than forked and so start without any of them.
+    """
+    global WRITER, RENDER_SCALE
+    if Path(asset_root) != cards.ASSET_ROOT:
+        cards.configure(asset_root=asset_root)
+    RENDER_SCALE = scale
+    if output_dir is not None:
+        WRITER = OutputWriter(output_dir, outputs, dpi=cards.DPI * scale)
 
 # ======================
-# HSV recolor
+# Check mode
 # ======================
-def recolor_frame_hsv(frame, hue, saturation):
-    frame = frame.convert("RGBA")
-    r, g, b, a = frame.split()
-
-    hsv = Image.merge("RGB", (r, g, b)).convert("HSV")
-    h, s, v = hsv.split()
-
-    h = Image.new("L", h.size, hue)
-    s = Image.new("L", s.size, saturation)
-
-    recolored = Image.merge("HSV", (h, s, v)).convert("RGBA")
-    recolored.putalpha(a)
-    return recolored
+def check_deck(deck_path, workers, show_all=False):
+    """
+    Lint every item: measure its text boxes and look for unknown markup and
+    missing files, without rendering. Returns the exit code.
+    """
+    input_errors = []
+    checked = 0
+    flagged = 0
+
+    items = read_deck(deck_path, input_errors)
+    results = render_deck(items, check_card, workers, setup=setup_worker, setup_args=(cards.ASSET_ROOT,))
+    for index, item, report, error in results:
+        checked += 1
+        if error:
+            flagged += 1
+            print(f"{item.get('name', '?')}: check failed\n{error}")
+            continue
+        if report.issues:
+            flagged += 1
+        if report.issues or show_all:
+            print(report)
+
+    for where, message in input_errors:
+        print(f"Skipped {deck_path}:{where}: {message}")
+
+    print(f"{checked} cards checked, {flagged} with issues")
+    return 1 if flagged or input_errors else 0
 
 # ======================
-# Load template
+# Watch mode
 # ======================
-def load_template(name):
-    base = Path("templates") / name
-
-    with open(base / "layout.json", "r") as f:
-        layout = json.load(f)
-
-    images = {
-        "base": Image.open(base / "base.png").convert("RGBA"),
-        "frame": Image.open(base / "frame.png").convert("RGBA")
-    }
-
-    mask_name = layout["art"].get("mask")
-    if mask_name:
-        mask_path = base / mask_name
-        images["mask"] = Image.open(mask_path).convert("L")
-    else:
-        images["mask"] = None
-
-    return layout, images
+def load_deck(path):
+    deck = {}
+    errors = []
+    for item in read_deck(path, errors):
+        if "name" in item:
+            deck[card_stem(item)] = item
+        else:
+            errors.append(("?", "item has no name"))
+    for where, message in errors:
+        print(f"Skipped {path}:{where}: {message}")
+    return deck, errors
+
+def watch(deck_path, manifest, interval=0.25):
+    """
+    Poll the deck and every card's input files, re-rendering only the cards
+    whose item or inputs changed. Runs in this process so every cache stays
+    warm between edits; stops on Ctrl-C.
+    """
+    graph = DependencyGraph()
+    files = FileWatcher([deck_path])
+    deck, _ = load_deck(deck_path)
+
+    def track(stem):
+        item = deck[stem]
+        try:
+            inputs = card_inputs(item)
+        except Exception:
+            inputs = []  # e.g. a missing template; the render reports it
+        graph.set(stem, inputs)
+        files.watch(inputs)
+        return inputs
+
+    def rebuild(stems):
+        start = time.perf_counter()
+        rendered = []
+        for stem in sorted(stems):
+            item = deck[stem]
+            inputs = track(stem)
+            try:
+                card_hash = manifest.card_hash(item, inputs, card_version())
+            except Exception:
+                card_hash = None
+            if card_hash and manifest.is_current(stem, card_hash):
+                continue
+
+            warn_markup(item)
+            try:
+                filenames = generate_card(item)
+            except Exception as e:
+                manifest.forget(stem)
+                print(f"Failed: {item['name']}: {e!r}")
+                continue
+            manifest.record(stem, card_hash, filenames)
+            rendered.append(stem)
+            print(f"Generated: {', '.join(filenames)}")
+
+        for stem, error in WRITER.wait():
+            manifest.forget(stem)
+            print(f"Failed: {stem}: writing outputs failed: {error!r}")
+
+        manifest.save()
+        if rendered:
+            print(f"{len(rendered)} rendered in {time.perf_counter() - start:.2f}s")
+
+    for stem in deck:
+        track(stem)
+    print(f"Watching {deck_path} and {len(graph.paths())} input files (Ctrl-C to stop)")
+
+    try:
+        while True:
+            time.sleep(interval)
+            changed = files.poll()
+            if not changed:
+                continue
+
+            stale = set()
+            deck_path_str = str(deck_path)
+            if deck_path_str in changed:
+                new_deck, errors = load_deck(deck_path)
+                if errors:
+                    # Probably saved mid-edit; keep cards that failed to parse
+                    new_deck = {**deck, **new_deck}
+                for stem in deck.keys() - new_deck.keys():
+                    graph.remove(stem)
+                if not deck_subset():
+                    for filename in manifest.prune(new_deck.keys()):
+                        print(f"Removed: {filename}")
+                stale.update(s for s, item in new_deck.items() if deck.get(s) != item)
+                deck = new_deck
+
+            inputs = [p for p in changed if p != deck_path_str]
+            cards.invalidate(inputs)
+            stale.update(graph.affected(inputs))
+
+            if stale:
+                rebuild(stale & deck.keys())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        WRITER.close()
+        manifest.save()
+    return 0
 
 # ======================
-# Generate card
+# Run
 # ======================
-def generate_card(item):
-    template_name = item.get("template", "default")
-    layout, assets = load_template(template_name)
-
-    rarity = item.get("rarity", "Common")
-    rarity_defs = layout.get("rarity_hsv", {})
-    rarity_def = rarity_defs.get(rarity, rarity_defs.get("Common"))
-
-    frame = (
-        recolor_frame_hsv(assets["frame"], rarity_def["h"], rarity_def["s"])
-        if rarity_def else assets["frame"]
+def main(argv=None):
+    global WRITER, RENDER_SCALE, DECK_QUERY, CHANGED_SINCE
+
+    parser = argparse.ArgumentParser(description="Generate playing cards.")
+    parser.add_argument(
+        "items",
+        nargs="?",
+        default="items.json",
+        help="deck file: .json ({\"items\": [...]} or an array) or .jsonl, read incrementally, "
+             "or a deck store (.db) built with store.py"
     )
-
-    card = frame.copy()
-    card.alpha_composite(assets["base"])
-    draw = ImageDraw.Draw(card)
-
-    debug_draw_box(draw, layout["title"], label="TITLE")
-    render_markup_centered_box(
-        item["name"],
-        card,
-        draw,
-        layout["title"],
-        {"normal": title_font, "bold": title_font, "italic": title_font},
-        TEXT_COLOR
+    parser.add_argument(
+        "--where",
+        action="append",
+        type=parse_query,
+        default=[],
+        metavar="FIELD=VALUE[,VALUE...]",
+        help="with a deck store, only use items matching every filter. "
+             "Fields: id, key, name, stem, template, rarity, type, image, icon. "
+             "Example: --where rarity=Rare,Legendary --where type=Summon"
     )
-
-    debug_draw_box(draw, layout["subtitle"], label="SUBTITLE")
-    render_markup(
-    item["type"],
-    card,
-    draw,
-    layout["subtitle"]["x"],
-    layout["subtitle"]["y"],
-    layout["subtitle"]["width"],
-    {
-        "normal": subtitle_font,
-        "bold": bold_font,
-        "italic": italic_font
-    },
-    TEXT_COLOR,
-    align="center"
-)
-
-
-
-    art = Image.open(Path("item_images") / item["image"]).convert("RGBA")
-    art = art.resize((layout["art"]["width"], layout["art"]["height"]))
-
-    card.paste(
-        art,
-        (layout["art"]["x"], layout["art"]["y"]),
-        assets["mask"] if assets["mask"] else art
+    parser.add_argument(
+        "--changed-since",
+        type=parse_timestamp,
+        metavar="TIME",
+        help="with a deck store, only use items modified after TIME (ISO 8601 or epoch seconds)"
     )
-
-    debug_draw_box(draw, layout["description"], label="DESCRIPTION")
-    render_markup_autoscale(
-        item["description"],
-        card,
-        draw,
-        layout["description"]["x"],
-        layout["description"]["y"],
-        layout["description"]["width"],
-        fonts_dict,
-        TEXT_COLOR,
-        layout["description"]["height"]
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=None,
+        help="render processes (default: one per core)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-render every card even if its inputs are unchanged"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        action="append",
+        type=parse_output,
+        metavar="FORMAT[:key=value,...]",
+        help="output to write per card, repeatable (default: png). "
+             "Formats: png, webp, jpeg. Keys: suffix, width, scale, level, quality, lossless, method. "
+             "Example: -o png:level=3 -o webp:width=256,quality=80,suffix=_thumb"
+    )
+    parser.add_argument(
+        "--encode-threads",
+        type=int,
+        default=2,
+        help="background encoder threads when rendering in one process (0 = encode inline)"
+    )
+    parser.add_argument(
+        "--sheets",
+        action="append",
+        choices=SHEET_KINDS,
+        help="also impose cards onto sheets in output/sheets, repeatable "
+             "(a4/letter print sheets with bleed and crop marks, or tts 10x7 deck sheets). "
+             "Renders every card, since sheets need all of them"
+    )
+    parser.add_argument("--bleed", type=float, default=3.0, help="print sheet bleed in mm")
+    parser.add_argument("--card-back", type=Path, help="image for the TTS card back slot")
+    parser.add_argument(
+        "--sheet-format",
+        choices=("pdf", "png"),
+        default="pdf",
+        help="print sheets as one multi-page PDF or a PNG per page"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="render previews at this fraction of the full card size (e.g. 0.25) into "
+             "output/preview/; text wraps exactly as at full size"
+    )
+    parser.add_argument(
+        "--check",
+        nargs="?",
+        const="issues",
+        choices=("issues", "all"),
+        help="lint only: lay out every text box and report font sizes, overflow, unknown "
+             "icons/colors and missing files without rendering. 'all' lists every card"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, keep polling the deck and card inputs and re-render only affected cards"
+    )
+    parser.add_argument(
+        "--assets",
+        type=Path,
+        metavar="DIR",
+        help="directory holding fonts/, templates/, icons/ and item_images/ (default: the repository root)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each pipeline stage per card and print a summary table to stderr"
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="write a Chrome trace timeline (chrome://tracing, Perfetto) to FILE; implies --profile"
+    )
+    args = parser.parse_args(argv)
+
+    PROFILER.enable(args.profile or args.trace is not None)
+
+    if args.assets:
+        cards.configure(asset_root=args.assets)
+    if not 0 < args.scale <= 1:
+        parser.error("--scale must be in (0, 1]")
+    if args.sheets and args.scale != 1:
+        parser.error("--sheets needs full size cards; drop --scale")
+    RENDER_SCALE = args.scale
+    if (args.where or args.changed_since is not None) and not is_store(args.items):
+        parser.error("--where and --changed-since need a deck store (.db)")
+    DECK_QUERY = tuple(args.where)
+    CHANGED_SINCE = args.changed_since
+
+    workers = args.workers or os.cpu_count() or 1
+    if args.check:
+        return check_deck(args.items, workers, args.check == "all")
+
+    output_dir = OUTPUT_DIR if RENDER_SCALE == 1 else PREVIEW_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs = args.output or DEFAULT_OUTPUTS
+    try:
+        output_names("card", outputs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Worker processes encode inline; they already keep every core busy
+    WRITER = OutputWriter(
+        output_dir,
+        outputs,
+        dpi=cards.DPI * RENDER_SCALE,
+        threads=args.encode_threads if workers == 1 else 0
     )
 
-    if "flavor" in item:
-        debug_draw_box(draw, layout["flavor"], label="FLAVOR")
-        render_markup_autoscale(
-            f'— {item["flavor"]}',
-            card,
-            draw,
-            layout["flavor"]["x"],
-            layout["flavor"]["y"],
-            layout["flavor"]["width"],
-            fonts_dict,
-            TEXT_COLOR,
-            layout["flavor"]["height"]
-        )
-
-    filename = item["name"].lower().replace(" ", "_") + ".png"
-    card.save(OUTPUT_DIR / filename, dpi=(DPI, DPI))
-    print(f"Generated: {filename}")
-
-# ======================
-# Run
-# ======================
-with open("items.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-for item in data["items"]:
-    generate_card(item)
+    imposer = None
+    render = generate_card
+    if args.sheets:
+        back = Image.open(args.card_back) if args.card_back else None
+        imposer = Imposer(OUTPUT_DIR / "sheets", args.sheets, cards.DPI, args.bleed, back, args.sheet_format)
+        render = generate_card_image
+
+    manifest = Manifest.load(output_dir)
+    progress = Progress()
+    input_errors = []
+    in_flight = {}
+    seen = set()
+    counts = {"total": 0, "rendered": 0}
+
+    def pending():
+        # Stream items from disk; only cards that need rendering go on
+        for item in read_deck(args.items, input_errors):
+            counts["total"] += 1
+            if "name" not in item:
+                input_errors.append((f"#{counts['total']}", "item has no name"))
+                continue
+
+            warn_markup(item)
+            stem = card_stem(item)
+            seen.add(stem)
+            try:
+                card_hash = manifest.card_hash(item, card_inputs(item), card_version())
+            except Exception:
+                card_hash = None  # let the render report what's wrong
+
+            if not (args.force or imposer) and card_hash and manifest.is_current(stem, card_hash):
+                progress.tick()
+                continue
+
+            in_flight[stem] = card_hash
+            yield item
+
+    failures = []
+    setup_args = (cards.ASSET_ROOT, RENDER_SCALE, output_dir, outputs)
+    results = render_deck(pending(), render, workers, setup=setup_worker, setup_args=setup_args)
+    for index, item, result, error in results:
+        counts["rendered"] += 1
+        progress.tick()
+        stem = card_stem(item)
+        card_hash = in_flight.pop(stem, None)
+
+        if error:
+            manifest.forget(stem)
+            failures.append((item.get("name", "?"), error))
+            print(f"Failed: {item.get('name', '?')}")
+        else:
+            filenames = result
+            if imposer:
+                filenames, card = result
+                imposer.add(card, item.get("template", "default"))
+
+            manifest.record(stem, card_hash, filenames)
+            print(f"Generated: {', '.join(filenames)}")
+
+    if imposer:
+        for path in imposer.close():
+            print(f"Sheet: {path}")
+
+    for stem, error in WRITER.close():
+        manifest.forget(stem)
+        failures.append((stem, f"writing outputs failed: {error!r}"))
+
+    if not input_errors and not deck_subset():
+        for filename in manifest.prune(seen):
+            print(f"Removed: {filename}")
+
+    manifest.save()
+    progress.done()
+
+    if PROFILER.enabled:
+        PROFILER.summary()
+        if args.trace:
+            PROFILER.write_trace(args.trace)
+            print(f"Trace: {args.trace}", file=sys.stderr)
+    print(f"{counts['rendered']} rendered, {counts['total'] - counts['rendered']} unchanged")
+
+    for where, message in input_errors:
+        print(f"Skipped {args.items}:{where}: {message}")
+
+    if failures:
+        print(f"\n{len(failures)} of {counts['rendered']} cards failed:")
+        for name, error in failures:
+            print(f"\n{name}\n{error}")
+
+    if args.watch:
+        WRITER = OutputWriter(output_dir, outputs, dpi=cards.DPI * RENDER_SCALE)
+        return watch(args.items, manifest)
+
+    return 1 if failures or input_errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import hashlib
+import json
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# ======================
+# Build manifest
+# ======================
+class Manifest:
+    """
+    Records a content hash and the output files of every card so unchanged
+    cards can be skipped on the next run. File digests are remembered by (mtime, size), so
+    unchanged inputs aren't re-read just to be hashed again.
+    """
+
+    def __init__(self, path, cards=None, files=None):
+        self.path = Path(path)
+        self.cards = cards or {}
+        self.files = files or {}
+        self._seen = set()
+
+    @classmethod
+    def load(cls, output_dir):
+        path = Path(output_dir) / MANIFEST_NAME
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("cards"), data.get("files"))
+
+    def save(self):
+        files = {k: v for k, v in self.files.items() if k in self._seen}
+        data = {"version": MANIFEST_VERSION, "cards": self.cards, "files": files}
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        tmp.replace(self.path)
+
+    def file_digest(self, path):
+        path = Path(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return "missing"
+
+        key = str(path)
+        self._seen.add(key)
+        known = self.files.get(key)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self.files[key] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def card_hash(self, item, inputs, version):
+        h = hashlib.sha256()
+        h.update(str(version).encode())
+        h.update(json.dumps(item, sort_keys=True, ensure_ascii=False).encode())
+        for path in sorted({str(p) for p in inputs}):
+            h.update(path.encode())
+            h.update(self.file_digest(path).encode())
+        return h.hexdigest()
+
+    def is_current(self, card, card_hash):
+        entry = self.cards.get(card)
+        return (
+            entry is not None
+            and entry["hash"] == card_hash
+            and all((self.path.parent / f).exists() for f in entry["files"])
+        )
+
+    def record(self, card, card_hash, files):
+        old = self.cards.get(card)
+        if old:
+            # Outputs that are no longer configured
+            for filename in set(old["files"]) - set(files):
+                (self.path.parent / filename).unlink(missing_ok=True)
+        self.cards[card] = {"hash": card_hash, "files": list(files)}
+
+    def forget(self, card):
+        self.cards.pop(card, None)
+
+    def prune(self, keep):
+        """Delete outputs recorded by earlier runs whose items are gone."""
+        removed = []
+        for card in sorted(set(self.cards) - set(keep)):
+            for filename in self.cards.pop(card)["files"]:
+                (self.path.parent / filename).unlink(missing_ok=True)
+                removed.append(filename)
+        return removed
@@ -1,22 +1,24 @@
 import re
 import textwrap
-from PIL import Image
+from collections import namedtuple
+from functools import lru_cache
+from icons import ICONS
+from metrics import METRICS
+from outlines import OUTLINES
+from profiling import PROFILER
 
 # ======================
 # Inline Markup Pattern
 # ======================
-# This regex splits a string into tokens for:
+# This regex finds the markup markers in a line:
 # - Bold: **bold text**
 # - Italic: *italic text*
 # - Colored text: {color}text{/}
-# - - bullet
 # - Icons: {icon:icon_name}
-# - \n for new lines
-# - \n\n for paragraph breaks
+# Bullets ("- "), \n line breaks and \n\n paragraph breaks are handled
+# by compile_markup before lines are tokenized.
 # Example: "This is **bold** and *italic* text with {red}red text{/} and an {icon:fire} icon."
-INLINE_PATTERN = re.compile(
-    r"(\*\*.*?\*\*|\*.*?\*|\{.*?\}.*?\{\/\}|\{icon:.*?\})"
-)
+INLINE_PATTERN = re.compile(r"\*\*|\*|\{([^}]*)\}")
 
 COLOR_MAP = {
     "red": (150, 30, 30, 255),
@@ -26,27 +28,10 @@ COLOR_MAP = {
     "default": (40, 30, 20, 255)
 }
 
-ICON_MAP = {
-    "fire": "icons/fire.png",
-    "lightning": "icons/lightning.png",
-    "frost": "icons/frost.png",
-    "melee": "icons/melee.png",
-    "shield": "icons/shield.png",
-    "heart": "icons/heart.png",
-    "rooted": "icons/rooted.png",
-    "poison": "icons/poison.png",
-    "magic": "icons/magic.png",
-    "armorbroken": "icons/armorbroken.png",
-    "ignited": "icons/ignited.png",
-    "dragon": "icons/dragon.png",
-    "blood": "icons/blood.png",
-    "eye": "icons/eye.png"
-}
-
  #======================
 # Fix to keep token effect when wrapping
 # ======================
-def wrap_tokens(tokens, draw, fonts, max_width, icon_size, space_width):
+def wrap_tokens(tokens, fonts, max_width, icon_size, space_width):
     lines = []
     current_line = []
     current_width = 0
@@ -57,15 +42,9 @@ def wrap_tokens(tokens, draw, fonts, max_width, icon_size, space_width):
             token_text = None
         else:
             content, style = token[1], token[2]
-            font = fonts["normal"]
-            if style["bold"] and style["italic"]:
-                font = fonts.get("bolditalic", fonts["bold"])
-            elif style["bold"]:
-                font = fonts["bold"]
-            elif style["italic"]:
-                font = fonts["italic"]
-
-            token_width = draw.textlength(content, font=font)
+            font = fonts.pick(style.bold, style.italic)
+
+            token_width = METRICS.width(content, font)
             token_text = content
 
         if current_width + token_width > max_width and current_line:
@@ -101,26 +80,10 @@ def explode_text_tokens(tokens):
 
     return exploded
 
-# ======================
-# Draw outlines text - for color
-# ======================
-def draw_text_with_outline(draw, position, text, font, fill, outline=(0, 0, 0, 255), outline_width=1):
-    x, y = position
-
-    # Draw outline
-    for dx in range(-outline_width, outline_width + 1):
-        for dy in range(-outline_width, outline_width + 1):
-            if dx == 0 and dy == 0:
-                continue
-            draw.text((x + dx, y + dy), text, font=font, fill=outline)
-
-    # Draw main text
-    draw.text((x, y), text, font=font, fill=fill)
-
 # ======================
 # Helper for centering text
 # ======================
-def measure_token_line(tokens, draw, fonts, icon_size):
+def measure_token_line(tokens, fonts, icon_size):
     width = 0
 
     for token in tokens:
@@ -130,204 +93,418 @@ def measure_token_line(tokens, draw, fonts, icon_size):
 
         content, style = token[1], token[2]
 
-        font = fonts["normal"]
-        if style["bold"] and style["italic"]:
-            font = fonts.get("bolditalic", fonts["bold"])
-        elif style["bold"]:
-            font = fonts["bold"]
-        elif style["italic"]:
-            font = fonts["italic"]
+        font = fonts.pick(style.bold, style.italic)
 
-        width += draw.textlength(content, font=font)
+        width += METRICS.width(content, font)
 
     return width
 
 
 
+# ======================
+# Markup AST
+# ======================
+Style = namedtuple("Style", "bold italic color")
+MarkupLine = namedtuple("MarkupLine", "bullet tokens")
+Markup = namedtuple("Markup", "source paragraphs diagnostics")
+
+class Diagnostic(namedtuple("Diagnostic", "pos line col message")):
+    def __str__(self):
+        return f"{self.line}:{self.col}: {self.message}"
+
+_STYLES = {}
+
+def make_style(bold=False, italic=False, color=None):
+    # Styles are interned so every token with the same look shares one object
+    key = (bold, italic, color)
+    style = _STYLES.get(key)
+    if style is None:
+        style = _STYLES[key] = Style(bold, italic, color)
+    return style
+
+PLAIN = make_style()
+
+def _style_of(stack):
+    bold = italic = False
+    color = None
+    for kind, _ in stack:
+        if kind == "bold":
+            bold = True
+        elif kind == "italic":
+            italic = True
+        else:
+            color = kind.split(":", 1)[1]
+    return make_style(bold, italic, color)
+
+def _innermost(stack, match):
+    for i in range(len(stack) - 1, -1, -1):
+        if match(stack[i][0]):
+            return i
+    return None
+
 # ======================
 # Parse Inline Markup
 # ======================
-def parse_inline(text):
+def parse_inline(text, offset=0, diagnostics=None):
+    """
+    Tokenize one line into ("text", content, Style) and ("icon", name)
+    tokens. Markers close the innermost matching opener, so "***x***" opens
+    and closes both bold and italic. Problems are appended to `diagnostics`
+    as (pos, message) with pos relative to the full source via `offset`.
+    """
     tokens = []
-    i = 0
     stack = []
-
-    def current_style():
-        style = {"bold": False, "italic": False, "color": None}
-        for s in stack:
-            if s == "bold":
-                style["bold"] = True
-            elif s == "italic":
-                style["italic"] = True
-            elif s.startswith("color:"):
-                style["color"] = s.split(":", 1)[1]
-        return style
-
-    buffer = ""
-
-    while i < len(text):
-        # ---- Bold ----
-        if text.startswith("**", i):
-            if buffer:
-                tokens.append(("text", buffer, current_style()))
-                buffer = ""
-            if stack and stack[-1] == "bold":
-                stack.pop()
+    buffer = []
+    last = 0
+
+    def report(pos, message):
+        if diagnostics is not None:
+            diagnostics.append((offset + pos, message))
+
+    def flush():
+        if buffer:
+            tokens.append(("text", "".join(buffer), _style_of(stack)))
+            buffer.clear()
+
+    for m in INLINE_PATTERN.finditer(text):
+        if m.start() > last:
+            buffer.append(text[last:m.start()])
+        last = m.end()
+
+        marker = m.group(0)
+        tag = m.group(1)
+
+        if tag is None:
+            flush()
+            kind = "bold" if marker == "**" else "italic"
+            i = _innermost(stack, lambda k: k == kind)
+            if i is None:
+                stack.append((kind, m.start()))
             else:
-                stack.append("bold")
-            i += 2
+                del stack[i]
             continue
 
-        # ---- Italic ----
-        if text.startswith("*", i):
-            if buffer:
-                tokens.append(("text", buffer, current_style()))
-                buffer = ""
-            if stack and stack[-1] == "italic":
-                stack.pop()
-            else:
-                stack.append("italic")
-            i += 1
-            continue
-
-        # ---- Color open ----
-        if text.startswith("{", i) and "}" in text[i:]:
-            end = text.find("}", i)
-            tag = text[i+1:end]
-
-            if tag == "/":
-                if stack and stack[-1].startswith("color:"):
-                    if buffer:
-                        tokens.append(("text", buffer, current_style()))
-                        buffer = ""
-                    stack.pop()
-                i = end + 1
+        if tag == "/":
+            i = _innermost(stack, lambda k: k.startswith("color:"))
+            if i is None:
+                report(m.start(), "{/} without an open color")
                 continue
+            flush()
+            del stack[i]
+            continue
 
-            if tag.startswith("icon:"):
-                if buffer:
-                    tokens.append(("text", buffer, current_style()))
-                    buffer = ""
-                tokens.append(("icon", tag.split(":", 1)[1]))
-                i = end + 1
-                continue
+        flush()
 
-            # color start
-            if buffer:
-                tokens.append(("text", buffer, current_style()))
-                buffer = ""
-            stack.append(f"color:{tag}")
-            i = end + 1
+        if tag.startswith("icon:"):
+            tokens.append(("icon", tag.split(":", 1)[1]))
             continue
 
-        # ---- Normal char ----
-        buffer += text[i]
-        i += 1
+        if tag not in COLOR_MAP:
+            report(m.start(), f"unknown color {{{tag}}}")
+        stack.append((f"color:{tag}", m.start()))
 
-    if buffer:
-        tokens.append(("text", buffer, current_style()))
+    if last < len(text):
+        buffer.append(text[last:])
+    flush()
+
+    for kind, pos in stack:
+        marker = {"bold": "**", "italic": "*"}.get(kind, "{" + kind[6:] + "}")
+        report(pos, f"unclosed {marker}")
 
     return tokens
 
 # ======================
-# Render Markup
+# Compile Markup
+# ======================
+def _line_col(source, pos):
+    line = source.count("\n", 0, pos) + 1
+    col = pos - (source.rfind("\n", 0, pos) + 1) + 1
+    return line, col
+
+@lru_cache(maxsize=4096)
+def compile_markup(text):
+    """
+    Parse a whole markup string into paragraphs of MarkupLines holding
+    word-level tokens. Cached by source string, so shared text such as type
+    lines is parsed once per deck.
+    """
+    found = []
+    paragraphs = []
+    offset = 0
+
+    for para in text.split("\n\n"):  # split paragraphs on double newline
+        lines = []
+        line_offset = offset
+        for line in para.split("\n"):  # split lines within paragraph
+            is_bullet = line.startswith("- ")
+            body = line[2:] if is_bullet else line
+
+            tokens = explode_text_tokens(
+                parse_inline(body, line_offset + (2 if is_bullet else 0), found)
+            )
+            lines.append(MarkupLine(is_bullet, tuple(tokens)))
+            line_offset += len(line) + 1
+
+        paragraphs.append(tuple(lines))
+        offset += len(para) + 2
+
+    diagnostics = tuple(
+        Diagnostic(pos, *_line_col(text, pos), message)
+        for pos, message in sorted(found)
+    )
+    return Markup(text, tuple(paragraphs), diagnostics)
+
+# ======================
+# Layout Result
 # ======================
-def render_markup(
+TextRun = namedtuple("TextRun", "x y text font color")
+IconRun = namedtuple("IconRun", "x y name size")
+LineBox = namedtuple("LineBox", "x y width height bullet runs")
+
+def outline_width_for(font):
+    # Scaled and fractional grid sizes are floats; masks need whole pixels
+    return max(1, int(font.size // 18))
+
+class LayoutResult:
+    """
+    Immutable output of layout_markup: positioned runs grouped in line boxes,
+    relative to the layout origin. Painting, centering and autoscale all
+    work from this so a text box is only laid out once.
+    """
+
+    __slots__ = ("fonts", "icon_size", "lines", "height", "_ink_bbox")
+
+    def __init__(self, fonts, icon_size, lines, height):
+        object.__setattr__(self, "fonts", fonts)
+        object.__setattr__(self, "icon_size", icon_size)
+        object.__setattr__(self, "lines", tuple(lines))
+        object.__setattr__(self, "height", height)
+        object.__setattr__(self, "_ink_bbox", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LayoutResult is immutable")
+
+    def runs(self):
+        for line in self.lines:
+            yield from line.runs
+
+    @property
+    def ink_bbox(self):
+        """(left, top, right, bottom) of everything painted, from font metrics."""
+        if self._ink_bbox is None:
+            boxes = []
+            for line in self.lines:
+                if line.bullet:
+                    l, t, r, b = self.fonts.normal.getbbox("•")
+                    boxes.append((l, line.y + t, r, line.y + b))
+
+                for run in line.runs:
+                    if isinstance(run, IconRun):
+                        boxes.append((int(run.x), run.y, int(run.x) + run.size, run.y + run.size))
+                        continue
+
+                    l, t, r, b = run.font.getbbox(run.text)
+                    if l == r or t == b:
+                        continue
+                    pad = outline_width_for(run.font) if run.color is not None else 0
+                    boxes.append((run.x + l - pad, run.y + t - pad, run.x + r + pad, run.y + b + pad))
+
+            bbox = (
+                min(b[0] for b in boxes),
+                min(b[1] for b in boxes),
+                max(b[2] for b in boxes),
+                max(b[3] for b in boxes)
+            ) if boxes else ()
+            object.__setattr__(self, "_ink_bbox", bbox)
+        return self._ink_bbox or None
+
+# ======================
+# Layout Markup
+# ======================
+def layout_markup(
     text,
-    image,
-    draw,
-    x,
-    y,
-    max_width,
     fonts,
-    default_color,
+    max_width,
     icon_size=28,
     line_spacing=6,
-    wrap_width=45,
-    measure_only=False,
     align="left"
 ):
+    """Wrap and position markup relative to (0, 0) without drawing anything."""
+    lines = []
+    cursor_y = 0
 
-    cursor_y = y
-    paragraphs = text.split("\n\n")  # split paragraphs on double newline
-
-    for para in paragraphs:
-        lines = para.split("\n")  # split lines within paragraph
-        for line in lines:
-            is_bullet = line.startswith("- ")
-            line = line[2:] if is_bullet else line
-
-            tokens = explode_text_tokens(parse_inline(line))
-
+    for para in compile_markup(text).paragraphs:
+        for is_bullet, tokens in para:
             wrapped_lines = wrap_tokens(
                 tokens,
-                draw,
                 fonts,
                 max_width - (22 if is_bullet else 0),
                 icon_size,
-                draw.textlength(" ", font=fonts["normal"])
+                METRICS.width(" ", fonts.normal)
             )
 
             for wrapped_tokens in wrapped_lines:
                 line_width = measure_token_line(
                     wrapped_tokens,
-                    draw,
                     fonts,
                     icon_size
                 )
 
                 if align == "center":
-                    cursor_x = x + (max_width - line_width) // 2
+                    line_x = (max_width - line_width) // 2
                 else:
-                    cursor_x = x + (22 if is_bullet else 0)
-
-
-                if is_bullet:
-                    draw.text((x, cursor_y), "•", fill=default_color, font=fonts["normal"])
+                    line_x = 22 if is_bullet else 0
 
+                cursor_x = line_x
+                runs = []
                 for token in wrapped_tokens:
                     if token[0] == "icon":
-                        if not measure_only:
-                            icon_path = ICON_MAP.get(token[1])
-                            if icon_path:
-                                icon_img = Image.open(icon_path).convert("RGBA")
-                                icon_img = icon_img.resize((icon_size, icon_size))
-                                image.paste(icon_img, (int(cursor_x), int(cursor_y)), icon_img)
+                        runs.append(IconRun(cursor_x, cursor_y, token[1], icon_size))
                         cursor_x += icon_size + 4
                         continue
 
-                    # text token
                     content, style = token[1], token[2]
+                    font = fonts.pick(style.bold, style.italic)
+                    runs.append(TextRun(cursor_x, cursor_y, content, font, style.color))
+                    cursor_x += METRICS.width(content, font)
 
-                    font = fonts["normal"]
-                    if style["bold"] and style["italic"]:
-                        font = fonts.get("bolditalic", fonts["bold"])
-                    elif style["bold"]:
-                        font = fonts["bold"]
-                    elif style["italic"]:
-                        font = fonts["italic"]
+                lines.append(LineBox(line_x, cursor_y, line_width, fonts.size, is_bullet, tuple(runs)))
+                cursor_y += fonts.size + line_spacing
 
-                    color = COLOR_MAP.get(style["color"], default_color)
+        cursor_y += fonts.size  # paragraph spacing
 
-                    if style["color"] is not None:
-                        draw_text_with_outline(
-                            draw,
-                            (cursor_x, cursor_y),
-                            content,
-                            font,
-                            fill=color,
-                            outline=(0, 0, 0, 255),
-                            outline_width= max(1, font.size // 18)
-                        )
-                    else:
-                        draw.text((cursor_x, cursor_y), content, fill=color, font=font)
+    return LayoutResult(fonts, icon_size, lines, cursor_y)
 
-                    cursor_x += draw.textlength(content, font=font)
+def markup_height(text, fonts, max_width, icon_size=28, line_spacing=6):
+    """layout_markup(...).height, from line wrapping alone."""
+    space_width = METRICS.width(" ", fonts.normal)
+    height = 0
 
+    for para in compile_markup(text).paragraphs:
+        for is_bullet, tokens in para:
+            lines = wrap_tokens(tokens, fonts, max_width - (22 if is_bullet else 0), icon_size, space_width)
+            height += len(lines) * (fonts.size + line_spacing)
+        height += fonts.size
 
+    return height
 
-                cursor_y += fonts["normal"].size + line_spacing
+# ======================
+# Paint Layout
+# ======================
+def paint_layout(layout, image, draw, x, y, default_color, icon_set=None, scale=1.0):
+    """
+    Paint a layout with its top left at (x, y). With scale != 1 positions,
+    fonts and icons are scaled while line breaks stay those of the layout,
+    so a preview wraps exactly like the full-size card.
+    """
+    with PROFILER.stage("paint_text"):
+        registry = layout.fonts.registry
+
+        for line in layout.lines:
+            if line.bullet:
+                font = registry.scaled(layout.fonts.normal, scale)
+                draw.text((x, y + line.y * scale), "•", fill=default_color, font=font)
+
+            for run in line.runs:
+                cursor_x = x + run.x * scale
+                cursor_y = y + run.y * scale
+
+                if isinstance(run, IconRun):
+                    icon_img = ICONS.get(run.name, max(1, round(run.size * scale)), icon_set)
+                    if icon_img is not None:
+                        image.paste(icon_img, (int(cursor_x), int(cursor_y)), icon_img)
+                    continue
+
+                color = COLOR_MAP.get(run.color, default_color)
+                font = registry.scaled(run.font, scale)
+
+                if run.color is not None:
+                    OUTLINES.paint(
+                        image,
+                        (cursor_x, cursor_y),
+                        run.text,
+                        font,
+                        fill=color,
+                        outline=(0, 0, 0, 255),
+                        outline_width=outline_width_for(font)
+                    )
+                else:
+                    draw.text((cursor_x, cursor_y), run.text, fill=color, font=font)
 
-        cursor_y += fonts["normal"].size  # paragraph spacing
+# ======================
+# Fit Markup
+# ======================
+def size_grid(spec, max_size, min_size=12):
+    """
+    Candidate font sizes, largest first. `spec` comes from a layout.json box
+    and is either an explicit list of sizes or {"max", "min", "step"};
+    None means whole points from max_size down to min_size. Raises
+    ValueError if that leaves no sizes at all.
+    """
+    if isinstance(spec, (list, tuple)):
+        if not spec:
+            raise ValueError("font_sizes is an empty list")
+        return sorted(set(spec), reverse=True)
+
+    spec = spec or {}
+    top = spec.get("max", max_size)
+    bottom = spec.get("min", min_size)
+    step = spec.get("step", 1)
+
+    sizes = []
+    i = 0
+    while top - i * step >= bottom:
+        size = round(top - i * step, 4)
+        sizes.append(int(size) if size == int(size) else size)
+        i += 1
+    if not sizes:
+        raise ValueError(f"font_sizes {spec!r} leaves no sizes from {top} down to {bottom}")
+    return sizes
 
-    return cursor_y
+def fit_markup(
+    text,
+    fonts,
+    max_width,
+    max_height,
+    sizes=None,
+    min_size=12,
+    icon_size=28,
+    line_spacing=6,
+    align="left"
+):
+    """
+    Binary search `sizes` for the largest font size whose layout fits within
+    max_height, measuring only. Falls back to the smallest size when nothing
+    fits. Returns the chosen layout so it can be painted without re-layout.
+    """
+    with PROFILER.stage("fit_markup"):
+        sizes = size_grid(sizes, fonts.size, min_size)
+
+        def fits(index):
+            PROFILER.count("fit_markup.probes")
+            height = markup_height(text, fonts.at(sizes[index]), max_width, icon_size, line_spacing)
+            return height <= max_height
+
+        # Probe sizes by height alone; only the chosen size gets positioned
+        # runs. Most text fits at the largest size, so try that first.
+        best = len(sizes) - 1
+        lo, hi = 1, len(sizes) - 1
+        if fits(0):
+            best, hi = 0, -1
+
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                best = mid
+                hi = mid - 1
+            else:
+                lo = mid + 1
+
+        return layout_markup(
+            text,
+            fonts.at(sizes[best]),
+            max_width,
+            icon_size=icon_size,
+            line_spacing=line_spacing,
+            align=align
+        )
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from PIL import ImageFont
+
+ASCII_GLYPHS = "".join(chr(c) for c in range(32, 127))
+
+# Pairs that kern in almost every Latin font, used to detect whether a font's
+# layout applies kerning before trusting summed glyph advances.
+KERNING_PROBES = ("AV", "AW", "To", "Ta", "Yo", "LT", "P.", "Wa", "Te", "y.")
+
+def font_key(font):
+    key = getattr(font, "cache_key", None)
+    if key is not None:
+        return key
+    return (getattr(font, "path", None), getattr(font, "index", 0), font.size)
+
+# ======================
+# Text metrics cache
+# ======================
+class TextMetrics:
+    """
+    Memoizes text advance widths keyed by (font identity, size, text) so a
+    word is only measured once per deck instead of once per wrap, line
+    measure and draw. Plain ASCII runs can skip FreeType entirely by summing
+    a per-font glyph advance table, as long as the font doesn't kern.
+
+    kerning: None detects per font (fast path only when no probe pair kerns),
+    True always measures with FreeType, False always uses the advance table.
+    """
+
+    def __init__(self, max_entries=65536, kerning=None):
+        self.max_entries = max_entries
+        self.kerning = kerning
+        self._widths = OrderedDict()
+        self._advances = {}
+        self.hits = 0
+        self.misses = 0
+        self.fast = 0
+
+    def advances(self, font):
+        """Per-glyph ASCII advance table, or None if summing would be wrong."""
+        key = font_key(font)
+        if key in self._advances:
+            return self._advances[key]
+
+        table = {c: font.getlength(c) for c in ASCII_GLYPHS}
+        if self.kerning is False:
+            kerns = False
+        elif font.layout_engine != ImageFont.Layout.BASIC:
+            kerns = True
+        else:
+            kerns = any(
+                font.getlength(pair) != table[pair[0]] + table[pair[1]]
+                for pair in KERNING_PROBES
+            )
+
+        self._advances[key] = None if kerns else table
+        return self._advances[key]
+
+    def width(self, text, font):
+        key = (font_key(font), text)
+        width = self._widths.get(key)
+        if width is not None:
+            self._widths.move_to_end(key)
+            self.hits += 1
+            return width
+
+        self.misses += 1
+        table = self.advances(font) if self.kerning is not True and text.isascii() else None
+        if table is not None and all(c in table for c in text):
+            width = sum(table[c] for c in text)
+            self.fast += 1
+        else:
+            width = font.getlength(text)
+
+        self._widths[key] = width
+        while len(self._widths) > self.max_entries:
+            self._widths.popitem(last=False)
+
+        return width
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fast_path": self.fast,
+            "entries": len(self._widths),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        self._widths.clear()
+        self._advances.clear()
+        self.hits = self.misses = self.fast = 0
+
+METRICS = TextMetrics()
@@ -0,0 +1,92 @@
+import math
+from collections import OrderedDict
+from PIL import Image, ImageChops, ImageDraw
+from metrics import font_key
+from profiling import PROFILER
+
+# ======================
+# Mask dilation
+# ======================
+def dilate_mask(mask, width):
+    """
+    Coverage of the mask stamped at every offset within `width`, combined
+    the way repeated alpha blending combines them: 1 - prod(1 - m). Matches
+    the old draw-it-(2w+1)^2-times outline without re-rasterizing.
+    The mask needs at least `width` pixels of empty padding on every side.
+    """
+    inverse = ImageChops.invert(mask)
+    acc = Image.new("L", mask.size, 255)
+
+    for dx in range(-width, width + 1):
+        for dy in range(-width, width + 1):
+            if dx == 0 and dy == 0:
+                continue
+            acc = ImageChops.multiply(acc, ImageChops.offset(inverse, dx, dy))
+
+    return ImageChops.invert(acc)
+
+# ======================
+# Outlined text masks
+# ======================
+# Text is placed to 1/SUBPIXEL of a pixel, which no one can see
+SUBPIXEL = 4
+
+class OutlineCache:
+    """
+    Rasterizes text once per (font, text, stroke, snapped subpixel offset) into a
+    fill mask plus a dilated outline mask, then composites the cached masks
+    in any color. Repeated colored keywords are pasted instead of re-rendered.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._masks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def masks(self, text, font, stroke_width, frac=(0, 0)):
+        key = (font_key(font), text, stroke_width, frac)
+        entry = self._masks.get(key)
+        if entry is not None:
+            self._masks.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        pad = stroke_width + 1
+        left, top, right, bottom = font.getbbox(text)
+        left, top = left - pad, top - pad
+        size = (right - left + pad, bottom - top + pad)
+
+        fill = Image.new("L", size, 0)
+        ImageDraw.Draw(fill).text((frac[0] - left, frac[1] - top), text, font=font, fill=255)
+
+        PROFILER.count("outline.miss")
+        with PROFILER.stage("outline_mask"):
+            entry = (dilate_mask(fill, stroke_width), fill, (left, top))
+        self._masks[key] = entry
+        while len(self._masks) > self.max_entries:
+            self._masks.popitem(last=False)
+
+        return entry
+
+    def paint(self, image, position, text, font, fill, outline=(0, 0, 0, 255), outline_width=1):
+        # Run positions are sums of float advances; snapping them to a
+        # SUBPIXEL grid lets a keyword reuse its masks wherever it lands
+        x, y = (round(v * SUBPIXEL) / SUBPIXEL for v in position)
+        int_x, int_y = math.floor(x), math.floor(y)
+        frac = (x - int_x, y - int_y)
+
+        # Dilation works in whole pixels; 2 and 2.0 share masks
+        stroke_mask, fill_mask, (left, top) = self.masks(text, font, int(outline_width), frac)
+        box = (int_x + left, int_y + top)
+        box = box + (box[0] + fill_mask.width, box[1] + fill_mask.height)
+
+        image.paste(outline, box, stroke_mask)
+        image.paste(fill, box, fill_mask)
+
+    def clear(self):
+        self._masks.clear()
+        self.hits = self.misses = 0
+
+OUTLINES = OutlineCache()
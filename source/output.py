@@ -0,0 +1,174 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+from profiling import PROFILER
+
+FORMATS = {
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+    "jpg": ("JPEG", ".jpg")
+}
+
+OutputSpec = namedtuple("OutputSpec", "format ext suffix width scale options")
+
+# ======================
+# Output specs
+# ======================
+def parse_output(text):
+    """
+    Parse "FORMAT[:key=value,...]" into an OutputSpec. Keys:
+      suffix    appended to the file stem (e.g. "_thumb")
+      width     resize to this width, keeping aspect ratio
+      scale     resize by this factor instead
+      level     PNG compression level 0-9 (Pillow's default is 6)
+      quality   WebP/JPEG quality 1-100
+      lossless  WebP lossless (true/false)
+      method    WebP effort 0 (fastest) to 6 (smallest); Pillow's default is 4
+    Example: "webp:width=256,quality=80,suffix=_thumb"
+    """
+    name, _, params = text.partition(":")
+    name = name.strip().lower()
+    if name not in FORMATS:
+        raise ValueError(f"unknown output format {name!r}")
+
+    fmt, ext = FORMATS[name]
+    suffix = ""
+    width = None
+    scale = None
+    options = {}
+
+    for param in filter(None, params.split(",")):
+        key, _, value = param.partition("=")
+        key = key.strip()
+        value = value.strip()
+
+        if key == "suffix":
+            suffix = value
+        elif key == "width":
+            width = int(value)
+        elif key == "scale":
+            scale = float(value)
+        elif key == "level":
+            options["compress_level"] = int(value)
+        elif key == "quality":
+            options["quality"] = int(value)
+        elif key == "lossless":
+            options["lossless"] = value.lower() in ("1", "true", "yes")
+        elif key == "method":
+            options["method"] = int(value)
+        else:
+            raise ValueError(f"unknown output option {key!r}")
+
+    return OutputSpec(fmt, ext, suffix, width, scale, options)
+
+DEFAULT_OUTPUTS = (parse_output("png"),)
+
+def output_names(stem, outputs):
+    names = [stem + spec.suffix + spec.ext for spec in outputs]
+    if len(set(names)) != len(names):
+        raise ValueError("outputs would overwrite each other; give them distinct suffixes")
+    return names
+
+# ======================
+# Encoding
+# ======================
+def encode_image(image, fp, spec, dpi):
+    """Resize/flatten image as `spec` asks and encode it to a path or file object."""
+    with PROFILER.stage(f"encode_{spec.format.lower()}"):
+        scale = 1.0
+        if spec.width:
+            scale = spec.width / image.width
+        elif spec.scale:
+            scale = spec.scale
+
+        if scale != 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        if spec.format == "JPEG":
+            # No alpha in JPEG; flatten onto white
+            background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+            image = Image.alpha_composite(background, image.convert("RGBA")).convert("RGB")
+
+        options = dict(spec.options)
+        if spec.format in ("PNG", "JPEG"):
+            options["dpi"] = (dpi * scale, dpi * scale)
+
+        image.save(fp, format=spec.format, **options)
+
+def encode_output(image, path, spec, dpi):
+    tmp = path.with_name(path.name + ".tmp")
+    encode_image(image, tmp, spec, dpi)
+    tmp.replace(path)
+
+# ======================
+# Output writer
+# ======================
+class OutputWriter:
+    """
+    Encodes and writes every configured output of a rendered card. With
+    threads > 0 the encoding runs on a bounded thread pool (Pillow's encoders
+    release the GIL), so the next card renders while this one compresses;
+    submit() blocks once `max_pending` cards are queued. Failures are
+    collected and returned by wait().
+    """
+
+    def __init__(self, output_dir, outputs=DEFAULT_OUTPUTS, dpi=300, threads=0, max_pending=None):
+        self.output_dir = Path(output_dir)
+        self.outputs = tuple(outputs)
+        self.dpi = dpi
+        self.threads = threads
+        self._pool = ThreadPoolExecutor(threads) if threads else None
+        self._slots = threading.BoundedSemaphore(max_pending or max(2, threads * 2))
+        self._lock = threading.Lock()
+        self._futures = []
+        self.failures = []
+
+    def _write(self, image, stem, names):
+        try:
+            with PROFILER.card(stem, "write"):
+                for name, spec in zip(names, self.outputs):
+                    encode_output(image, self.output_dir / name, spec, self.dpi)
+        except Exception as e:
+            with self._lock:
+                self.failures.append((stem, e))
+        finally:
+            if self._pool:
+                self._slots.release()
+
+    def submit(self, image, stem):
+        """Queue image for writing; returns the output file names."""
+        names = output_names(stem, self.outputs)
+
+        if self._pool is None:
+            for name, spec in zip(names, self.outputs):
+                encode_output(image, self.output_dir / name, spec, self.dpi)
+            return names
+
+        self._slots.acquire()
+        future = self._pool.submit(self._write, image, stem, names)
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+        return names
+
+    def wait(self):
+        """Block until everything queued is written; returns and clears failures."""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+        with self._lock:
+            failures, self.failures = self.failures, []
+        return failures
+
+    def close(self):
+        failures = self.wait()
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+        return failures
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+_NULL = nullcontext()
+
+# ======================
+# Stage timer
+# ======================
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+class _Card:
+    __slots__ = ("profiler", "name", "stage", "start", "counts", "outer")
+
+    def __init__(self, profiler, name, stage):
+        self.profiler = profiler
+        self.name = name
+        self.stage = stage
+        self.counts = {}
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.outer = getattr(local, "card", None)
+        local.card = self
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        self.profiler._record(self.stage, self.start, duration, self.counts or None)
+        self.profiler._local.card = self.outer
+        return False
+
+# ======================
+# Profiler
+# ======================
+class Profiler:
+    """
+    Times named pipeline stages and counts cache hits / layout attempts.
+    Disabled (the default) stage() and card() hand back a shared no-op
+    context and count() returns at once, so instrumented code costs a method
+    call. Enabled, every stage is kept as a Chrome trace "complete" event
+    tagged with the card being rendered on that thread; counters are also
+    kept per card. Worker processes drain() their events and the parent
+    merge()s them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def card(self, name, stage="card"):
+        """
+        Attribute stages and counts on this thread to card `name`; the span
+        itself is recorded as `stage`.
+        """
+        if not self.enabled:
+            return _NULL
+        return _Card(self, name, stage)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        card = getattr(self._local, "card", None)
+        if card is not None:
+            card.counts[name] = card.counts.get(name, 0) + n
+
+    def _record(self, name, start, duration, counts=None):
+        card = getattr(self._local, "card", None)
+        event = {
+            "name": card.name if card and name == card.stage else name,
+            "cat": name,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident()
+        }
+        args = {}
+        if card is not None:
+            args["card"] = card.name
+        if counts:
+            args.update(counts)
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """Return and clear everything recorded so far, for merge()."""
+        with self._lock:
+            data = (self.events, self.counters)
+            self.events, self.counters = [], {}
+        return data
+
+    def merge(self, data):
+        events, counters = data
+        with self._lock:
+            self.events.extend(events)
+            for name, n in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    # ======================
+    # Reports
+    # ======================
+    def stage_totals(self):
+        """{stage: (calls, total_ms, max_ms)}, stages nest so totals overlap."""
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            calls, total, longest = totals.get(event["cat"], (0, 0.0, 0.0))
+            dur = event["dur"] / 1000
+            totals[event["cat"]] = (calls + 1, total + dur, max(longest, dur))
+        return totals
+
+    def slowest_cards(self, n=5):
+        with self._lock:
+            cards = [e for e in self.events if e["cat"] == "card"]
+        cards.sort(key=lambda e: e["dur"], reverse=True)
+        return [(e["name"], e["dur"] / 1000) for e in cards[:n]]
+
+    def summary(self, stream=sys.stderr):
+        totals = self.stage_totals()
+        if not totals and not self.counters:
+            return
+
+        print(f"\n{'stage':<22} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}", file=stream)
+        for name, (calls, total, longest) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+            print(f"{name:<22} {calls:>7} {total:>10.1f} {total / calls:>9.2f} {longest:>9.2f}", file=stream)
+
+        if self.counters:
+            print(f"\n{'counter':<30} {'count':>9}", file=stream)
+            for name, n in sorted(self.counters.items()):
+                print(f"{name:<30} {n:>9}", file=stream)
+
+        slowest = self.slowest_cards()
+        if slowest:
+            print("\nslowest cards:", file=stream)
+            for name, ms in slowest:
+                print(f"  {ms:>9.1f} ms  {name}", file=stream)
+
+    def write_trace(self, path):
+        """Write a Chrome trace (chrome://tracing, Perfetto) of every event."""
+        with self._lock:
+            data = {
+                "traceEvents": list(self.events),
+                "displayTimeUnit": "ms",
+                "otherData": {"counters": dict(self.counters)}
+            }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+PROFILER = Profiler()
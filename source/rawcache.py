@@ -0,0 +1,144 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from PIL import Image
+from profiling import PROFILER
+
+RAW_CACHE_DIR = Path(".cache") / "raw"
+
+# Each entry is one file: a 16-byte header, then the pixels row by row with
+# no padding, exactly as Image.tobytes() lays them out.
+#   magic    4s   b"KRAW"
+#   version  B
+#   bands    B    1 = L, 3 = RGB, 4 = RGBA
+#   reserved H
+#   width    I
+#   height   I
+HEADER = struct.Struct("<4sBBHII")
+MAGIC = b"KRAW"
+VERSION = 1
+MODES = {"L": 1, "RGB": 3, "RGBA": 4}
+BANDS = {bands: mode for mode, bands in MODES.items()}
+
+# ======================
+# Raw image cache
+# ======================
+class RawCache:
+    """
+    Decoded images on disk as raw pixels, keyed by a hash of their inputs.
+    Hits are memory-mapped and wrapped in a read-only Image without a copy,
+    so every process rendering from the same cache shares the pages through
+    the OS page cache instead of decoding its own. Source file hashes are
+    remembered per file by (mtime, size), so an unchanged file costs a stat
+    instead of a re-read. With no cache_dir, nothing touches the disk.
+    """
+
+    def __init__(self, cache_dir=RAW_CACHE_DIR):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._digests = {}
+
+    def _write(self, path, write):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write(tmp)
+            tmp.replace(path)
+        except OSError:
+            tmp.unlink(missing_ok=True)  # the disk cache is best effort
+
+    def digest(self, path):
+        """Content hash of a source file."""
+        path = Path(path)
+        st = path.stat()
+        stamp = [st.st_mtime_ns, st.st_size]
+
+        known = self._digests.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+
+        sidecar = None
+        if self.cache_dir:
+            name = hashlib.sha1(str(path.resolve()).encode()).hexdigest()
+            sidecar = self.cache_dir / "sources" / f"{name}.json"
+            try:
+                with open(sidecar, "r") as f:
+                    saved = json.load(f)
+                if saved["stamp"] == stamp:
+                    self._digests[path] = (stamp, saved["digest"])
+                    return saved["digest"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._digests[path] = (stamp, digest)
+
+        if sidecar:
+            data = json.dumps({"path": str(path), "stamp": stamp, "digest": digest})
+            self._write(sidecar, lambda p: p.write_text(data))
+
+        return digest
+
+    def key(self, *parts):
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def entry_path(self, kind, key):
+        return self.cache_dir / kind / f"{key[:40]}.raw"
+
+    def load(self, kind, key):
+        """The cached image for key, mapped read-only, or None."""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.entry_path(kind, key), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None  # missing, or empty
+
+        if len(mapped) < HEADER.size:
+            return None
+        magic, version, bands, _, width, height = HEADER.unpack_from(mapped)
+        mode = BANDS.get(bands)
+        if (
+            magic != MAGIC or version != VERSION or mode is None
+            or len(mapped) != HEADER.size + width * height * bands
+        ):
+            return None
+
+        pixels = memoryview(mapped)[HEADER.size:]
+        return Image.frombuffer(mode, (width, height), pixels, "raw", mode, 0, 1)
+
+    def store(self, kind, key, image):
+        if not self.cache_dir or image.mode not in MODES:
+            return
+
+        def write(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, MODES[image.mode], 0, image.width, image.height))
+                f.write(image.tobytes())
+
+        self._write(self.entry_path(kind, key), write)
+
+    def get(self, kind, key, build):
+        """The cached image for key, or build() stored under it."""
+        image = self.load(kind, key)
+        if image is not None:
+            PROFILER.count(f"raw.{kind}.hit")
+            return image
+
+        PROFILER.count(f"raw.{kind}.miss")
+        image = build()
+        self.store(kind, key, image)
+        return image
+
+    def decoded(self, path, mode="RGBA"):
+        """The image file at path converted to mode."""
+        key = self.key("decoded", self.digest(path), mode)
+        return self.get("decoded", key, lambda: Image.open(path).convert(mode))
+
+    def invalidate(self):
+        self._digests.clear()
+
+RAW = RawCache()
@@ -0,0 +1,316 @@
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool, TimeoutError
+from urllib.parse import urlparse, parse_qs
+import cards
+from batch import warm_caches
+from output import parse_output, output_names
+from templates import TEMPLATES
+
+CONTENT_TYPES = {
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg"
+}
+
+# Lossless WebP at the lowest effort (quality and method 0) keeps alpha and
+# exact pixels while encoding a full card in tens of milliseconds; PNG costs
+# several times the render itself. Lossy formats are opt-in via ?format=.
+DEFAULT_FORMAT = "webp:lossless=true,quality=0,method=0"
+
+# ======================
+# Worker processes
+# ======================
+def _init_worker(template_names, asset_root, debug_layout):
+    # Workers may be spawned, so they don't inherit main()'s configure()
+    cards.configure(asset_root=asset_root, debug_layout=debug_layout)
+    warm_caches(template_names)
+    for role in cards.FONT_FAMILIES:
+        cards.font_family(role)
+
+def _render(item, fmt, scale):
+    return cards.render_card_bytes(item, fmt, scale)
+
+# ======================
+# Latency metrics
+# ======================
+class LatencyStats:
+    """Request counts per endpoint and latency percentiles over recent requests."""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(endpoint, deque(maxlen=self.window))
+            samples.append(seconds)
+            key = (endpoint, status)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = {k: sorted(v) for k, v in self._samples.items()}
+            counts = dict(self._counts)
+
+        def pct(values, p):
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+
+        endpoints = {}
+        for endpoint, values in samples.items():
+            endpoints[endpoint] = {
+                "requests": {str(s): n for (e, s), n in counts.items() if e == endpoint},
+                "latency_ms": {
+                    "p50": pct(values, 0.50),
+                    "p90": pct(values, 0.90),
+                    "p99": pct(values, 0.99),
+                    "max": round(values[-1] * 1000, 2)
+                }
+            }
+        return endpoints
+
+# ======================
+# Render service
+# ======================
+class Busy(Exception):
+    pass
+
+class TooLarge(ValueError):
+    pass
+
+class RenderService:
+    """
+    Renders on a pool of warm worker processes. At most `max_queue` cards
+    may be rendering or waiting at once; past that, render() raises Busy
+    straight away so the HTTP layer can answer 503 instead of queueing
+    without bound. A card keeps its slot until its render actually ends,
+    even if the request waiting for it has timed out.
+    """
+
+    def __init__(self, workers=None, max_queue=None, timeout=30.0, template_names=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.workers * 4
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.rejected = 0
+        initargs = (tuple(template_names), cards.ASSET_ROOT, cards.DEBUG_LAYOUT)
+        self.pool = Pool(self.workers, initializer=_init_worker, initargs=initargs)
+
+    def _admit(self, count):
+        if count > self.max_queue:
+            raise TooLarge(f"{count} items is more than the queue limit of {self.max_queue}")
+        with self._lock:
+            if self.queued + count > self.max_queue:
+                self.rejected += 1
+                raise Busy()
+            self.queued += count
+
+    def _finished(self, _):
+        with self._lock:
+            self.queued -= 1
+
+    def render(self, items, fmt, scale=1.0):
+        """Render items concurrently; returns a list of bytes in order."""
+        self._admit(len(items))
+        pending = [
+            self.pool.apply_async(
+                _render, (item, fmt, scale), callback=self._finished, error_callback=self._finished
+            )
+            for item in items
+        ]
+        deadline = time.monotonic() + self.timeout
+        return [p.get(max(0.0, deadline - time.monotonic())) for p in pending]
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+# ======================
+# HTTP handler
+# ======================
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    POST /render   one item (JSON object) -> image bytes
+    POST /batch    {"items": [...]} or an array -> zip of images
+    GET  /metrics  latency percentiles, request counts, queue depth
+    GET  /health   "ok"
+    Both POST endpoints take ?format=FORMAT[:key=value,...] like -o, and
+    ?scale=0.25 for a quick preview that wraps like the full-size card.
+    """
+
+    server_version = "CardRender/1"
+    max_body = 16 << 20
+
+    def send_body(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.status = status
+
+    def send_json(self, status, data, headers=()):
+        body = json.dumps(data, indent=2).encode()
+        self.send_body(status, body, "application/json", headers)
+
+    def send_error_json(self, status, message, headers=()):
+        self.send_json(status, {"error": message}, headers)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_body:
+            raise ValueError(f"request body over {self.max_body} bytes")
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self.send_body(200, b"ok\n", "text/plain")
+        elif path == "/metrics":
+            service = self.server.service
+            self.send_json(200, {
+                "endpoints": self.server.stats.snapshot(),
+                "queue": {
+                    "active": service.queued,
+                    "limit": service.max_queue,
+                    "rejected": service.rejected
+                },
+                "workers": service.workers
+            })
+        else:
+            self.send_error_json(404, "not found")
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        self.status = 500
+        try:
+            if url.path in ("/render", "/batch"):
+                self.handle_render(url)
+            else:
+                self.send_error_json(404, "not found")
+        finally:
+            self.server.stats.record(url.path, self.status, time.perf_counter() - start)
+
+    def handle_render(self, url):
+        query = parse_qs(url.query)
+        try:
+            spec = parse_output(query.get("format", [self.server.default_format])[0])
+            scale = float(query.get("scale", ["1"])[0])
+            if not 0 < scale <= 1:
+                raise ValueError("scale must be in (0, 1]")
+            data = self.read_json()
+        except ValueError as e:
+            self.send_error_json(400, str(e))
+            return
+
+        if url.path == "/render":
+            items = [data]
+        else:
+            items = data.get("items") if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                self.send_error_json(400, 'expected an array or {"items": [...]}')
+                return
+
+        for item in items:
+            if not isinstance(item, dict) or "name" not in item:
+                self.send_error_json(400, "every item must be an object with a name")
+                return
+
+        try:
+            images = self.server.service.render(items, spec, scale)
+        except Busy:
+            self.send_error_json(503, "render queue is full", [("Retry-After", "1")])
+            return
+        except TooLarge as e:
+            self.send_error_json(413, str(e))
+            return
+        except TimeoutError:
+            self.send_error_json(504, "render timed out")
+            return
+        except Exception as e:
+            self.send_error_json(422, f"render failed: {e!r}")
+            return
+
+        if url.path == "/render":
+            self.send_body(200, images[0], CONTENT_TYPES[spec.format])
+            return
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for item, image in zip(items, images):
+                name = output_names(cards.card_stem(item), (spec,))[0]
+                archive.writestr(name, image)
+        self.send_body(200, buffer.getvalue(), "application/zip")
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, default_format=DEFAULT_FORMAT):
+        super().__init__(address, RenderHandler)
+        self.service = service
+        self.stats = LatencyStats()
+        self.default_format = default_format
+
+# ======================
+# Run
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve card renders over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="render processes (default: one per core)")
+    parser.add_argument(
+        "--queue",
+        type=int,
+        default=None,
+        help="cards rendering or waiting before new requests get 503, and the largest "
+             "batch accepted (default: 4 per worker)"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a render request gets 504")
+    parser.add_argument(
+        "--format",
+        default=DEFAULT_FORMAT,
+        help=f"default image format, same syntax as main.py -o (default: {DEFAULT_FORMAT})"
+    )
+    parser.add_argument("--assets", help="directory holding fonts/, templates/, icons/ and item_images/")
+    parser.add_argument("--no-debug-layout", action="store_true", help="render without the debug grid and boxes")
+    args = parser.parse_args(argv)
+
+    try:
+        parse_output(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Before the pool starts; workers repeat it with the same settings
+    cards.configure(asset_root=args.assets, debug_layout=False if args.no_debug_layout else None)
+    template_names = sorted(p.name for p in TEMPLATES.root.iterdir() if (p / "layout.json").exists())
+
+    service = RenderService(args.workers, args.queue, args.timeout, template_names)
+    server = RenderServer((args.host, args.port), service, args.format)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {service.workers} workers", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
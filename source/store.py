@@ -0,0 +1,296 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+from cards import card_stem, card_icons
+from deck import iter_items
+from markup import INLINE_PATTERN
+
+STORE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    key      TEXT NOT NULL UNIQUE,
+    stem     TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    name     TEXT NOT NULL COLLATE NOCASE,
+    template TEXT NOT NULL COLLATE NOCASE,
+    rarity   TEXT NOT NULL COLLATE NOCASE,
+    type     TEXT NOT NULL COLLATE NOCASE,
+    image    TEXT COLLATE NOCASE,
+    data     TEXT NOT NULL,
+    digest   TEXT NOT NULL,
+    created  REAL NOT NULL,
+    modified REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_template ON items (template);
+CREATE INDEX IF NOT EXISTS items_rarity ON items (rarity);
+CREATE INDEX IF NOT EXISTS items_type ON items (type);
+CREATE INDEX IF NOT EXISTS items_image ON items (image);
+CREATE INDEX IF NOT EXISTS items_modified ON items (modified);
+
+CREATE TABLE IF NOT EXISTS item_icons (
+    item_id INTEGER NOT NULL REFERENCES items (id) ON DELETE CASCADE,
+    icon    TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (item_id, icon)
+);
+CREATE INDEX IF NOT EXISTS item_icons_icon ON item_icons (icon);
+"""
+
+# Fields --where can filter on; "icon" matches any icon used in the card's text
+QUERY_FIELDS = {
+    "id": "id",
+    "key": "key",
+    "name": "name",
+    "stem": "stem",
+    "template": "template",
+    "rarity": "rarity",
+    "type": "type",
+    "image": "image",
+    "icon": None
+}
+
+StoredItem = namedtuple("StoredItem", "id key stem name template rarity type image modified")
+
+# ======================
+# Queries
+# ======================
+def parse_query(text):
+    """
+    Parse FIELD=VALUE[,VALUE...] into (field, values). Values match whole
+    fields, ignoring case; several values match any of them.
+    """
+    field, sep, values = text.partition("=")
+    field = field.strip().lower()
+    if not sep or not values:
+        raise ValueError(f"expected FIELD=VALUE, got {text!r}")
+    if field not in QUERY_FIELDS:
+        raise ValueError(f"unknown field {field!r} (expected one of: {', '.join(QUERY_FIELDS)})")
+    return field, tuple(v.strip() for v in values.split(","))
+
+def parse_timestamp(text):
+    """Seconds since the epoch, or an ISO 8601 date/time (local time unless it has an offset)."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"expected an ISO 8601 date/time or epoch seconds, got {text!r}") from None
+
+def card_type(item):
+    """The card type without markup or rarity: "**Summon** - *Rare*" -> "Summon"."""
+    plain = INLINE_PATTERN.sub("", item.get("type", ""))
+    return plain.split("-", 1)[0].strip()
+
+def is_store(path):
+    return Path(path).suffix.lower() in STORE_SUFFIXES
+
+# ======================
+# Deck store
+# ======================
+class DeckStore:
+    """
+    A deck kept in SQLite. Every item gets a stable id and key (its "id"
+    field, else its name) that survive re-imports, and a unique output stem:
+    its usual stem, or the stem plus the id when another item already has
+    it. Template, rarity, type, art and icons are indexed so a query only
+    reads the items it returns.
+    """
+
+    def __init__(self, path, create=False):
+        self.path = Path(path)
+        if not create and not self.path.exists():
+            raise FileNotFoundError(f"no deck store at {self.path}")
+
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"{self.path} has schema version {version}, expected {SCHEMA_VERSION}")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _free_stem(self, stem, item_id):
+        """stem, or stem_<id> (then stem_<id>_2, ...) if another item has it."""
+        candidate, n = stem, 1
+        while self.db.execute(
+            "SELECT 1 FROM items WHERE stem = ? AND id != ?", (candidate, item_id)
+        ).fetchone():
+            n += 1
+            candidate = f"{stem}_{item_id}" if n == 2 else f"{stem}_{item_id}_{n - 1}"
+        return candidate
+
+    def import_items(self, items, replace=False, now=None):
+        """
+        Add or update items, matched to stored ones by key. Only items whose
+        content changed get a new modified time. With replace, stored items
+        missing from `items` are deleted. Returns counts by outcome.
+        """
+        now = time.time() if now is None else now
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+
+        with self.db:
+            for item in items:
+                key = str(item.get("id") or card_stem(item))
+                base, n = key, 1
+                while key in seen:  # same name twice in one deck
+                    n += 1
+                    key = f"{base}#{n}"
+                seen.add(key)
+
+                data = json.dumps(item, ensure_ascii=False, sort_keys=True)
+                digest = hashlib.sha256(data.encode()).hexdigest()
+                row = self.db.execute("SELECT id, digest, name FROM items WHERE key = ?", (key,)).fetchone()
+                if row and row[1] == digest:
+                    counts["unchanged"] += 1
+                    continue
+
+                fields = (
+                    item["name"],
+                    item.get("template", "default"),
+                    item.get("rarity", "Common"),
+                    card_type(item),
+                    item.get("image"),
+                    data,
+                    digest
+                )
+                if row:
+                    item_id = row[0]
+                    self.db.execute(
+                        "UPDATE items SET name = ?, template = ?, rarity = ?, type = ?, image = ?,"
+                        " data = ?, digest = ?, modified = ? WHERE id = ?",
+                        fields + (now, item_id)
+                    )
+                    counts["updated"] += 1
+                else:
+                    item_id = self.db.execute(
+                        "INSERT INTO items (key, stem, name, template, rarity, type, image, data, digest, created, modified)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, "\0" + key) + fields + (now, now)
+                    ).lastrowid
+                    counts["added"] += 1
+
+                # A renamed item follows its new name; an unchanged one keeps its stem
+                if not row or row[2] != item["name"]:
+                    stem = self._free_stem(card_stem(item), item_id)
+                    self.db.execute("UPDATE items SET stem = ? WHERE id = ?", (stem, item_id))
+
+                self.db.execute("DELETE FROM item_icons WHERE item_id = ?", (item_id,))
+                self.db.executemany(
+                    "INSERT INTO item_icons (item_id, icon) VALUES (?, ?)",
+                    [(item_id, icon) for icon in sorted(card_icons(item))]
+                )
+
+            if replace:
+                stale = [
+                    item_id for item_id, key in self.db.execute("SELECT id, key FROM items")
+                    if key not in seen
+                ]
+                self.db.executemany("DELETE FROM items WHERE id = ?", [(i,) for i in stale])
+                counts["removed"] = len(stale)
+
+        return counts
+
+    def _select(self, columns, where=(), since=None):
+        clauses = []
+        params = []
+        for field, values in where:
+            marks = ", ".join("?" * len(values))
+            if field == "icon":
+                clauses.append(f"id IN (SELECT item_id FROM item_icons WHERE icon IN ({marks}))")
+            else:
+                clauses.append(f"{QUERY_FIELDS[field]} IN ({marks})")
+            params.extend(values)
+        if since is not None:
+            clauses.append("modified > ?")
+            params.append(since)
+
+        sql = f"SELECT {columns} FROM items"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self.db.execute(sql + " ORDER BY id", params)
+
+    def items(self, where=(), since=None):
+        """
+        Yield the items matching every (field, values) filter in `where`, and
+        modified after `since` if given, in id order.
+        """
+        for stem, data in self._select("stem, data", where, since):
+            item = json.loads(data)
+            if stem != card_stem(item):
+                item["stem"] = stem
+            yield item
+
+    def rows(self, where=(), since=None):
+        columns = ", ".join(StoredItem._fields)
+        for row in self._select(columns, where, since):
+            yield StoredItem(*row)
+
+# ======================
+# Run
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a deck in an indexed SQLite store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="add or update items from .json/.jsonl decks")
+    p.add_argument("store", type=Path, help="deck store to create or update (.db)")
+    p.add_argument("decks", nargs="+", type=Path)
+    p.add_argument("--replace", action="store_true", help="delete stored items missing from the imported decks")
+
+    p = commands.add_parser("list", help="list stored items matching a query")
+    p.add_argument("store", type=Path)
+    p.add_argument("--where", action="append", type=parse_query, default=[], metavar="FIELD=VALUE[,VALUE...]")
+    p.add_argument("--changed-since", type=parse_timestamp, metavar="TIME")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        with DeckStore(args.store) as store:
+            for row in store.rows(args.where, args.changed_since):
+                modified = datetime.fromtimestamp(row.modified).isoformat(" ", "seconds")
+                print(f"{row.id:>6}  {row.stem:<32} {row.template:<12} {row.rarity:<10} {row.type:<12} {modified}")
+        return 0
+
+    errors = []
+
+    def items():
+        for deck in args.decks:
+            deck_errors = []
+            for item in iter_items(deck, deck_errors):
+                if "name" in item:
+                    yield item
+                else:
+                    deck_errors.append(("?", "item has no name"))
+            errors.extend((deck, where, message) for where, message in deck_errors)
+
+    with DeckStore(args.store, create=True) as store:
+        # A partial read must not delete what it failed to read
+        counts = store.import_items(list(items()), args.replace and not errors)
+
+    for deck, where, message in errors:
+        print(f"Skipped {deck}:{where}: {message}")
+    print(", ".join(f"{n} {outcome}" for outcome, n in counts.items()))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
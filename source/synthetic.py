@@ -0,0 +1,100 @@
+import json
+import random
+from icons import ICON_MAP
+from markup import COLOR_MAP
+
+RARITIES = ("Common", "Uncommon", "Rare", "Legendary")
+TYPES = ("Consumable", "Summon", "Weapon", "Armor", "Spell", "Relic")
+
+WORDS = (
+    "ancient blade forged deep beneath mountain halls whispers of forgotten kings "
+    "adjacent players gain lose resist burning frozen poisoned strength armor until "
+    "the end of their next turn every enemy within range suffers damage heals restores "
+    "once per round discard draw a card sacrifice summon bind the creature's soul"
+).split()
+
+# How much markup each complexity level packs into a card:
+#   sentences  description sentences per paragraph
+#   paragraphs description paragraphs
+#   bullets    bullet lines before the paragraphs
+#   icons      chance of an icon after a word
+#   colors     chance of a colored run
+#   styles     chance of a bold/italic run
+COMPLEXITY = {
+    "simple": {"sentences": 1, "paragraphs": 1, "bullets": 0, "icons": 0.0, "colors": 0.0, "styles": 0.05},
+    "normal": {"sentences": 2, "paragraphs": 1, "bullets": 3, "icons": 0.05, "colors": 0.05, "styles": 0.1},
+    "heavy": {"sentences": 4, "paragraphs": 2, "bullets": 5, "icons": 0.15, "colors": 0.1, "styles": 0.2}
+}
+
+# ======================
+# Synthetic markup
+# ======================
+def _phrase(rng, words, level):
+    out = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < level["colors"]:
+            color = rng.choice([c for c in COLOR_MAP if c != "default"])
+            word = f"**{{{color}}}{word.upper()}{{/}}**"
+        elif roll < level["colors"] + level["styles"]:
+            word = rng.choice(("**{}**", "*{}*", "***{}***")).format(word)
+        out.append(word)
+
+        if rng.random() < level["icons"]:
+            out.append(f"{{icon:{rng.choice(list(ICON_MAP))}}}")
+    return " ".join(out)
+
+def synthetic_description(rng, level):
+    lines = [
+        f"- **{rng.randint(1, 9)}** {{icon:{rng.choice(list(ICON_MAP))}}} {_phrase(rng, 2, level)}"
+        for _ in range(level["bullets"])
+    ]
+    paragraphs = ["\n".join(lines)] if lines else []
+
+    for _ in range(level["paragraphs"]):
+        sentences = [
+            _phrase(rng, rng.randint(6, 14), level).capitalize() + "."
+            for _ in range(level["sentences"])
+        ]
+        paragraphs.append(" ".join(sentences))
+
+    return "\n\n".join(paragraphs)
+
+def synthetic_item(rng, index, complexity="normal", template="parchment", images=("lifecrystal.png", "kjello.png")):
+    level = COMPLEXITY[complexity]
+    rarity = RARITIES[index % len(RARITIES)]
+    color = {"Common": "default", "Uncommon": "green", "Rare": "blue", "Legendary": "gold"}[rarity]
+
+    item = {
+        "template": template,
+        "name": f"{rng.choice(WORDS).upper()} {index:05d}",
+        "type": f"**{rng.choice(TYPES)}** - ***{{{color}}}{rarity}{{/}}***",
+        "rarity": rarity,
+        "description": synthetic_description(rng, level),
+        "image": images[index % len(images)]
+    }
+    if index % 3:
+        plain = dict(COMPLEXITY["simple"], styles=0.0)
+        item["flavor"] = f"\"*{_phrase(rng, rng.randint(4, 10), plain).capitalize()}.*\""
+
+    return item
+
+# ======================
+# Synthetic decks
+# ======================
+def synthetic_deck(count, complexity="normal", seed=0, **options):
+    """Yield `count` reproducible items that cycle through every rarity."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield synthetic_item(rng, index, complexity, **options)
+
+def write_deck(path, items):
+    """Write items as .jsonl (one per line) or a .json {"items": [...]} deck."""
+    path = str(path)
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        else:
+            json.dump({"items": list(items)}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,238 @@
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from PIL import Image, ImageChops
+from profiling import PROFILER
+from rawcache import RAW
+
+TEMPLATE_DIR = Path("templates")
+
+# ======================
+# Rarity recolor
+# ======================
+# A frame is recolored by keeping each pixel's HSV value (max of R, G, B)
+# and replacing hue and saturation. For a fixed (hue, saturation) the result
+# only depends on that value, so it is a 256-entry lookup table applied as a
+# palette instead of a round trip through full-frame HSV images.
+#
+# Rarity specs in layout.json ("rarity_hsv") support:
+#   "h", "s"    target hue and saturation (0-255)
+#   "curve"     value curve: a gamma number, or [[in, out], ...] points
+#   "tint"      0-1 strength, blending the recolor over the original frame
+#   "gradient"  {"h", "s", "direction": "vertical" | "horizontal"} to fade
+#               from the base hue/saturation to another across the frame
+def value_curve(curve):
+    if curve is None:
+        return list(range(256))
+
+    if isinstance(curve, (int, float)):
+        return [round(255 * (v / 255) ** curve) for v in range(256)]
+
+    points = sorted((int(p[0]), int(p[1])) for p in curve)
+    if points[0][0] > 0:
+        points.insert(0, (0, points[0][1]))
+    if points[-1][0] < 255:
+        points.append((255, points[-1][1]))
+
+    values = []
+    for v in range(256):
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x0 <= v <= x1:
+                t = (v - x0) / (x1 - x0) if x1 != x0 else 0
+                values.append(max(0, min(255, round(y0 + (y1 - y0) * t))))
+                break
+    return values
+
+@lru_cache(maxsize=64)
+def hsv_palette(hue, saturation, curve=None):
+    """RGB palette mapping value -> color for a fixed hue and saturation."""
+    values = value_curve(json.loads(curve) if curve else None)
+    size = (256, 1)
+
+    hsv = Image.merge("HSV", (
+        Image.new("L", size, hue),
+        Image.new("L", size, saturation),
+        Image.frombytes("L", size, bytes(values))
+    ))
+    return list(hsv.convert("RGB").tobytes())
+
+def frame_value(frame):
+    r, g, b, a = frame.convert("RGBA").split()
+    return ImageChops.lighter(ImageChops.lighter(r, g), b), a
+
+def recolor_value(value, alpha, hue, saturation, curve=None):
+    key = json.dumps(curve) if curve is not None else None
+    indexed = value.copy()
+    indexed.putpalette(hsv_palette(hue, saturation, key))
+
+    recolored = indexed.convert("RGBA")
+    recolored.putalpha(alpha)
+    return recolored
+
+def recolor_frame(frame, spec):
+    frame = frame.convert("RGBA")
+    value, alpha = frame_value(frame)
+    curve = spec.get("curve")
+
+    recolored = recolor_value(value, alpha, spec["h"], spec["s"], curve)
+
+    gradient = spec.get("gradient")
+    if gradient:
+        end = recolor_value(value, alpha, gradient["h"], gradient["s"], gradient.get("curve", curve))
+        ramp = Image.linear_gradient("L")
+        if gradient.get("direction") == "horizontal":
+            ramp = ramp.rotate(90, expand=True)
+        recolored = Image.composite(end, recolored, ramp.resize(frame.size))
+
+    tint = spec.get("tint")
+    if tint is not None and tint < 1:
+        recolored = Image.blend(frame, recolored, tint)
+
+    return recolored
+
+def recolor_frame_hsv(frame, hue, saturation):
+    return recolor_frame(frame, {"h": hue, "s": saturation})
+
+# ======================
+# Load template
+# ======================
+def load_template(name, root=TEMPLATE_DIR):
+    base = Path(root) / name
+
+    with open(base / "layout.json", "r") as f:
+        layout = json.load(f)
+
+    images = {
+        "base": RAW.decoded(base / "base.png"),
+        "frame": RAW.decoded(base / "frame.png")
+    }
+
+    mask_name = layout["art"].get("mask")
+    if mask_name:
+        mask_path = base / mask_name
+        images["mask"] = RAW.decoded(mask_path, "L")
+    else:
+        images["mask"] = None
+
+    return layout, images
+
+def template_files(name, layout, root=TEMPLATE_DIR):
+    base = Path(root) / name
+    files = [base / "layout.json", base / "base.png", base / "frame.png"]
+
+    mask_name = layout["art"].get("mask")
+    if mask_name:
+        files.append(base / mask_name)
+
+    return files
+
+def file_stamp(paths):
+    stamp = []
+    for path in paths:
+        st = Path(path).stat()
+        stamp.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+# ======================
+# Template registry
+# ======================
+class TemplateRegistry:
+    """
+    Loads each template once and memoizes the recolored frame + base layer
+    per (template, rarity). Both caches are LRU-bounded, and entries are
+    dropped as soon as any of the template's files change on disk.
+    """
+
+    def __init__(self, root=TEMPLATE_DIR, max_templates=8, max_layers=32):
+        self.root = Path(root)
+        self.max_templates = max_templates
+        self.max_layers = max_layers
+        self._templates = OrderedDict()  # name -> (stamp, layout, images)
+        self._layers = OrderedDict()     # (name, rarity, scale) -> (stamp, layer)
+
+    def _current(self, name):
+        entry = self._templates.get(name)
+        if entry is not None:
+            stamp, layout, images = entry
+            try:
+                if file_stamp(template_files(name, layout, self.root)) == stamp:
+                    self._templates.move_to_end(name)
+                    return entry
+            except FileNotFoundError:
+                pass
+            self.invalidate(name)
+
+        PROFILER.count("template.miss")
+        with PROFILER.stage("load_template"):
+            layout, images = load_template(name, self.root)
+        stamp = file_stamp(template_files(name, layout, self.root))
+        entry = (stamp, layout, images)
+
+        self._templates[name] = entry
+        while len(self._templates) > self.max_templates:
+            evicted, _ = self._templates.popitem(last=False)
+            self._drop_layers(evicted)
+
+        return entry
+
+    def _drop_layers(self, name):
+        for key in [k for k in self._layers if k[0] == name]:
+            del self._layers[key]
+
+    def load(self, name):
+        _, layout, images = self._current(name)
+        return layout, images
+
+    def card_layer(self, name, rarity, scale=1.0):
+        """
+        Return the shared recolored frame with the base composited on top,
+        resized by `scale`. Callers must copy() before drawing on it.
+        """
+        stamp, layout, images = self._current(name)
+        key = (name, rarity, scale)
+
+        entry = self._layers.get(key)
+        if entry is not None and entry[0] == stamp:
+            self._layers.move_to_end(key)
+            PROFILER.count("frame_layer.hit")
+            return entry[1]
+
+        PROFILER.count("frame_layer.miss")
+        rarity_defs = layout.get("rarity_hsv", {})
+        rarity_def = rarity_defs.get(rarity, rarity_defs.get("Common"))
+        base = self.root / name
+        raw_key = RAW.key(RAW.digest(base / "frame.png"), RAW.digest(base / "base.png"), rarity_def, scale)
+
+        def build():
+            if scale != 1:
+                full = self.card_layer(name, rarity)
+                size = (max(1, round(full.width * scale)), max(1, round(full.height * scale)))
+                return full.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+            with PROFILER.stage("recolor_frame"):
+                frame = (
+                    recolor_frame(images["frame"], rarity_def)
+                    if rarity_def else images["frame"].copy()
+                )
+                frame.alpha_composite(images["base"])
+            return frame
+
+        frame = RAW.get("layer", raw_key, build)
+        self._store_layer(key, stamp, frame)
+        return frame
+
+    def _store_layer(self, key, stamp, frame):
+        self._layers[key] = (stamp, frame)
+        while len(self._layers) > self.max_layers:
+            self._layers.popitem(last=False)
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._templates.clear()
+            self._layers.clear()
+            return
+        self._templates.pop(name, None)
+        self._drop_layers(name)
+
+TEMPLATES = TemplateRegistry()
@@ -0,0 +1,77 @@
+import os
+from collections import defaultdict
+
+# ======================
+# Dependency graph
+# ======================
+class DependencyGraph:
+    """
+    Which files each card was rendered from, and the reverse: which cards
+    use each file. Paths are kept as strings.
+    """
+
+    def __init__(self):
+        self.inputs = {}                 # card -> frozenset of paths
+        self.users = defaultdict(set)    # path -> cards
+
+    def set(self, card, paths):
+        self.remove(card)
+        paths = frozenset(str(p) for p in paths)
+        self.inputs[card] = paths
+        for path in paths:
+            self.users[path].add(card)
+
+    def remove(self, card):
+        for path in self.inputs.pop(card, ()):
+            users = self.users[path]
+            users.discard(card)
+            if not users:
+                del self.users[path]
+
+    def affected(self, paths):
+        cards = set()
+        for path in paths:
+            cards.update(self.users.get(str(path), ()))
+        return cards
+
+    def paths(self):
+        return set(self.users)
+
+# ======================
+# Polling file watcher
+# ======================
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class FileWatcher:
+    """
+    Polls a set of files by (mtime, size). poll() returns the paths that
+    changed, appeared or disappeared since they were last seen.
+    """
+
+    def __init__(self, paths=()):
+        self.stamps = {}
+        self.watch(paths)
+
+    def watch(self, paths):
+        for path in paths:
+            path = str(path)
+            if path not in self.stamps:
+                self.stamps[path] = _stamp(path)
+
+    def unwatch(self, paths):
+        for path in paths:
+            self.stamps.pop(str(path), None)
+
+    def poll(self):
+        changed = []
+        for path, old in self.stamps.items():
+            new = _stamp(path)
+            if new != old:
+                self.stamps[path] = new
+                changed.append(path)
+        return changed